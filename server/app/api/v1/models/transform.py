@@ -4,11 +4,16 @@ from fastapi import HTTPException
 
 
 # --- Input Section ---
-SUPPORTED_INPUT_FORMATS = ["geojson", "shp", "dxf", "csv"]
+SUPPORTED_INPUT_FORMATS = ["geojson", "shp", "dxf", "csv", "fgb", "parquet", "feather"]
+# formats not read through GDAL, so OGR SQL `where` filters cannot be pushed down
+INPUT_FORMATS_WITHOUT_WHERE = ["csv", "parquet", "feather"]
 
 class InputModel(BaseModel):
     format: str
     epsg: Optional[int] = None
+    columns: Optional[List[str]] = None     # attribute columns to load, geometry is always read
+    bbox: Optional[List[float]] = None      # [minx, miny, maxx, maxy] in the input CRS
+    where: Optional[str] = None             # OGR SQL attribute filter
 
     @model_validator(mode="after")
     def validate_format(cls, values):
@@ -25,6 +30,25 @@ class InputModel(BaseModel):
                         status_code=400,
                         detail=f"field 'input.epsg' is required for {values.format}"
                     )
+
+        if values.bbox is not None:
+            if len(values.bbox) != 4:
+                raise HTTPException(
+                    status_code=400,
+                    detail="field 'input.bbox' must be [minx, miny, maxx, maxy]"
+                )
+            minx, miny, maxx, maxy = values.bbox
+            if minx > maxx or miny > maxy:
+                raise HTTPException(
+                    status_code=400,
+                    detail="field 'input.bbox' must have minx <= maxx and miny <= maxy"
+                )
+
+        if values.where is not None and values.format in INPUT_FORMATS_WITHOUT_WHERE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"field 'input.where' is not supported for {values.format}"
+            )
         return values
 
 # --- Transformation Section ---
@@ -37,18 +61,25 @@ class BufferTransformation(BaseModel):
     type: Literal["buffer"]
     params: BufferParams
 
+class UnionParams(BaseModel):
+    # the polygons do not overlap and share edges exactly (e.g. parcels, admin areas)
+    coverage: Optional[bool] = None
+
 class UnionTransformation(BaseModel):
     type: Literal["union"]
+    params: Optional[UnionParams] = None
 
 TransformationModel = Union[BufferTransformation, UnionTransformation]
 
 # --- Output Section ---
-SUPPORTED_OUTPUT_FORMATS = ["geojson", "shp", "dxf", "csv"]
+SUPPORTED_OUTPUT_FORMATS = ["geojson", "shp", "dxf", "csv", "fgb", "parquet", "feather"]
 
 class OutputModel(BaseModel):
     format: str
     epsg: Optional[int] = 4326          # default WGS-84
     to_file: bool = True                
+    csv_geometry: Literal["wkt", "wkb_hex"] = "wkt"   # geom_wkt column, or hex WKB in geom_wkb
+    compression: Optional[Literal["gzip", "zstd"]] = None   # compressed CSV output
 
     @model_validator(mode="after")
     def validate_output(cls, values):
@@ -71,6 +102,18 @@ class OutputModel(BaseModel):
                 detail="`to_file=false` is only supported when `format` is 'geojson'.",
             )
 
+        if values.csv_geometry != "wkt" and fmt != "csv":
+            raise HTTPException(
+                status_code=400,
+                detail="`csv_geometry` is only supported when `format` is 'csv'.",
+            )
+
+        if values.compression is not None and fmt != "csv":
+            raise HTTPException(
+                status_code=400,
+                detail="`compression` is only supported when `format` is 'csv'.",
+            )
+
         # normalise back to original case
         values.format = fmt
         return values
@@ -80,4 +123,6 @@ class OutputModel(BaseModel):
 class TransformIn(BaseModel):
     input: InputModel
     transformations: List[TransformationModel] = []
-    output: OutputModel
\ No newline at end of file
+    output: OutputModel
+    # small inputs run immediately and the output is returned in the response
+    sync: bool = False
\ No newline at end of file
@@ -2,8 +2,10 @@
 import logging
 import os
 import shutil
+from typing import List
 from celery import shared_task
 from app.core.config import config as app_config
+from app.api.v1.operations.geoprocessing.stage_cache import evict_stages
 
 logger = logging.getLogger("api")  # Use a logger specific to tasks if desired
 
@@ -15,6 +17,23 @@ def cleanup_operation(self, job_id: str) -> None:
     Args:
         job_id (str): The unique job identifier.
     """
+    remove_job_dir(job_id)
+    # cached stages of the job's input expire on the same schedule
+    evict_stages(app_config.STAGE_CACHE_MAX_BYTES, app_config.JOB_EXPIRY_TIME)
+
+@shared_task(bind=True, name="app.routers.tasks.cleanup_batch_task")
+def cleanup_batch_operation(self, job_ids: List[str]) -> None:
+    """
+    Cleanup task to remove the job directories of every job in a batch.
+
+    Args:
+        job_ids (List[str]): The job identifiers of the batch.
+    """
+    for job_id in job_ids:
+        remove_job_dir(job_id)
+    evict_stages(app_config.STAGE_CACHE_MAX_BYTES, app_config.JOB_EXPIRY_TIME)
+
+def remove_job_dir(job_id: str) -> None:
     job_dir = os.path.join(app_config.DATA_PATH, job_id)
     try:
         if os.path.exists(job_dir):
@@ -1,21 +1,62 @@
 import geopandas as gpd
-import pyproj
-from shapely.geometry import box
+import numpy as np
+import shapely
+from typing import Optional
+from app.api.v1.operations.geoprocessing.crs import get_crs, reproject, feature_utm_epsg_codes
+from app.api.v1.operations.geoprocessing.parallel import map_chunks
+from app.core.config import config as app_config
 
-def get_utm_crs(geometry):
+def _buffer_values(values: np.ndarray, distance_in_meters: float, simplify_tolerance: float) -> np.ndarray:
     """
-    Determine the appropriate UTM CRS for a given geometry.
+    Buffer (and optionally simplify) an array of geometries that are already in a metric CRS.
     """
-    centroid = geometry.centroid
-    utm_zone = int((centroid.x + 180) // 6) + 1
-    hemisphere = 'north' if centroid.y >= 0 else 'south'
-    return f"EPSG:326{utm_zone}" if hemisphere == 'north' else f"EPSG:327{utm_zone}"
+    # quad_segs matches the GeoSeries.buffer default resolution
+    buffered_values = shapely.buffer(values, distance_in_meters, quad_segs=16)
 
-def apply_buffer(input_gdf, distance, units, simplify_tolerance=None):
+    # Simplify the buffered geometries if tolerance is greater than 0
+    if simplify_tolerance > 0.0:
+        buffered_values = shapely.simplify(buffered_values, simplify_tolerance)
+
+    return buffered_values
+
+def _buffer_series(
+        geometry: gpd.GeoSeries,
+        distance_in_meters: float,
+        simplify_tolerance: float,
+        workers: int = 1,
+        chunk_size: int = 50_000
+    ) -> gpd.GeoSeries:
     """
-    Apply a buffer transformation to a GeoDataFrame with specified distance and units,
+    Buffer and simplify a GeoSeries in `chunk_size` pieces on `workers` threads.
+    """
+    buffered_values = map_chunks(
+        lambda values: _buffer_values(values, distance_in_meters, simplify_tolerance),
+        np.asarray(geometry.values),
+        workers,
+        chunk_size
+    )
+    return gpd.GeoSeries(buffered_values, index=geometry.index, crs=geometry.crs)
+
+def buffer_geometry(
+        input_gdf: gpd.GeoDataFrame,
+        distance: float,
+        units: str,
+        simplify_tolerance: Optional[float] = None,
+        workers: Optional[int] = None,
+        chunk_size: Optional[int] = None
+    ) -> gpd.GeoSeries:
+    """
+    Buffer the geometry of a GeoDataFrame with specified distance and units,
     reprojecting if necessary to ensure accurate distance measurements in a projected CRS,
-    and optionally simplifying the resulting buffered geometries.
+    and optionally simplifying the resulting buffered geometries. Returns the
+    buffered geometry in the CRS of the input.
+
+    Geographic data is buffered in UTM. The zone of each feature comes from the
+    centre of its bounds; features in different zones are buffered in their own
+    zone and the results merged back in the original order.
+
+    Buffering runs in chunks of `chunk_size` geometries on `workers` threads
+    (defaults: BUFFER_CHUNK_SIZE and BUFFER_WORKERS).
     """
     # Convert distance to meters based on input units
     unit_factors = {
@@ -30,30 +71,47 @@ def apply_buffer(input_gdf, distance, units, simplify_tolerance=None):
 
     distance_in_meters = distance * unit_factors[units]
 
+    if workers is None:
+        workers = app_config.BUFFER_WORKERS
+    if chunk_size is None:
+        chunk_size = app_config.BUFFER_CHUNK_SIZE
+
     # Dynamically set simplify_tolerance if not provided
     if simplify_tolerance is None:
         simplify_tolerance = distance_in_meters * 0.03  # 3% of the buffer distance
 
-    # Check and reproject if CRS is geographic (in degrees)
     original_crs = input_gdf.crs
-    if original_crs and pyproj.CRS(original_crs).is_geographic:
-        # Reproject to the most suitable UTM zone
-        utm_crs = get_utm_crs(input_gdf.unary_union)
-        input_gdf = input_gdf.to_crs(utm_crs)
+    if original_crs and get_crs(original_crs).is_geographic:
+        # Buffer each UTM zone partition in its own zone, then back to the original CRS
+        utm_codes = feature_utm_epsg_codes(input_gdf.geometry)
+        zones = np.unique(utm_codes)
 
-    # Apply buffer transformation in meters
-    buffered_geometry = input_gdf.buffer(distance_in_meters)
+        if len(zones) == 1:
+            utm_geometry = reproject(input_gdf.geometry, int(zones[0]))
+            buffered_geometry = reproject(_buffer_series(utm_geometry, distance_in_meters, simplify_tolerance, workers, chunk_size), original_crs)
+        else:
+            buffered_values = np.empty(len(input_gdf), dtype=object)
+            for zone in zones:
+                in_zone = utm_codes == zone
+                utm_geometry = reproject(input_gdf.geometry[in_zone], int(zone))
+                zone_buffered = reproject(_buffer_series(utm_geometry, distance_in_meters, simplify_tolerance, workers, chunk_size), original_crs)
+                buffered_values[in_zone] = np.asarray(zone_buffered.values)
+            buffered_geometry = gpd.GeoSeries(buffered_values, index=input_gdf.index, crs=original_crs)
+    else:
+        # Apply buffer transformation in the (projected) units of the data
+        buffered_geometry = _buffer_series(input_gdf.geometry, distance_in_meters, simplify_tolerance, workers, chunk_size)
 
-    # Simplify the buffered geometries if tolerance is greater than 0
-    if simplify_tolerance > 0.0:
-        buffered_geometry = buffered_geometry.simplify(simplify_tolerance)
+    return buffered_geometry
+
+def apply_buffer(input_gdf, distance, units, simplify_tolerance=None, workers: Optional[int] = None, chunk_size: Optional[int] = None):
+    """
+    Apply a buffer transformation to a GeoDataFrame (see buffer_geometry),
+    keeping the original attributes.
+    """
+    buffered_geometry = buffer_geometry(input_gdf, distance, units, simplify_tolerance, workers, chunk_size)
 
     # Create a new GeoDataFrame with original attributes and buffered geometry
     buffered_gdf = input_gdf.copy()
     buffered_gdf['geometry'] = buffered_geometry
 
-    # Reproject back to original CRS if needed
-    if original_crs and pyproj.CRS(original_crs).is_geographic:
-        buffered_gdf = buffered_gdf.to_crs(original_crs)
-
     return buffered_gdf
@@ -0,0 +1,127 @@
+import logging
+from functools import lru_cache
+from itertools import permutations
+from typing import Optional, Union
+import geopandas as gpd
+import numpy as np
+import pyproj
+import shapely
+from app.core.config import config as app_config
+
+logger = logging.getLogger("api")
+
+CRSLike = Union[int, str, pyproj.CRS]
+
+def _crs_key(crs: CRSLike) -> str:
+    """
+    Hashable cache key for anything pyproj accepts as a CRS. A CRS object is
+    keyed by the definition it was created from.
+    """
+    if isinstance(crs, pyproj.CRS):
+        return crs.srs
+    if isinstance(crs, (int, np.integer)):
+        return f"EPSG:{int(crs)}"
+    return str(crs)
+
+@lru_cache(maxsize=app_config.CRS_CACHE_SIZE)
+def _cached_crs(key: str) -> pyproj.CRS:
+    return pyproj.CRS.from_user_input(key)
+
+@lru_cache(maxsize=app_config.CRS_CACHE_SIZE)
+def _cached_epsg(key: str) -> Optional[int]:
+    return _cached_crs(key).to_epsg()
+
+@lru_cache(maxsize=app_config.CRS_CACHE_SIZE)
+def _cached_transformer(source_key: str, target_key: str) -> pyproj.Transformer:
+    return pyproj.Transformer.from_crs(_cached_crs(source_key), _cached_crs(target_key), always_xy=True)
+
+def get_crs(crs: CRSLike) -> pyproj.CRS:
+    """
+    Process-wide cached pyproj.CRS for an EPSG code, CRS string or CRS object.
+    """
+    if isinstance(crs, pyproj.CRS):
+        return crs
+    return _cached_crs(_crs_key(crs))
+
+def crs_to_epsg(crs: CRSLike) -> Optional[int]:
+    """
+    Cached equivalent of ``pyproj.CRS.to_epsg()``, which does a slow database
+    lookup for CRSs that were not created from an EPSG code.
+    """
+    return _cached_epsg(_crs_key(crs))
+
+def get_transformer(source: CRSLike, target: CRSLike) -> pyproj.Transformer:
+    """
+    Process-wide cached (always_xy) transformer between two CRSs.
+    """
+    return _cached_transformer(_crs_key(source), _crs_key(target))
+
+def reproject(data: Union[gpd.GeoDataFrame, gpd.GeoSeries], target: CRSLike):
+    """
+    Drop-in replacement for ``to_crs`` that reuses cached CRS and Transformer
+    objects. Data already in the target CRS (same definition, or the same
+    EPSG code) is returned unchanged.
+    """
+    if data.crs is None:
+        raise ValueError("Cannot reproject data with no CRS defined.")
+
+    source_key, target_key = _crs_key(data.crs), _crs_key(target)
+    if source_key == target_key:
+        return data
+
+    target_epsg = _cached_epsg(target_key)
+    if target_epsg is not None and _cached_epsg(source_key) == target_epsg:
+        return data
+
+    transformer = _cached_transformer(source_key, target_key)
+    geometry = data if isinstance(data, gpd.GeoSeries) else data.geometry
+    values = np.asarray(geometry.values)
+
+    transformed = np.empty(len(values), dtype=object)
+    has_z = shapely.has_z(values)
+    if has_z.any():
+        transformed[has_z] = shapely.transform(values[has_z], transformer.transform, include_z=True, interleaved=False)
+    transformed[~has_z] = shapely.transform(values[~has_z], transformer.transform, include_z=False, interleaved=False)
+
+    reprojected = gpd.GeoSeries(transformed, index=geometry.index, crs=_cached_crs(target_key), name=geometry.name)
+    if isinstance(data, gpd.GeoSeries):
+        return reprojected
+    return data.set_geometry(reprojected)
+
+def utm_epsg_codes(lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+    """
+    Vectorized UTM EPSG code (WGS-84 north 326xx / south 327xx) for arrays of
+    longitudes and latitudes.
+    """
+    utm_zone = np.clip(np.floor((lon + 180) / 6).astype(int) + 1, 1, 60)
+    return np.where(lat >= 0, 32600, 32700) + utm_zone
+
+def feature_utm_epsg_codes(geometry: gpd.GeoSeries) -> np.ndarray:
+    """
+    UTM EPSG code for every feature, taken from the centre of its bounds.
+    Missing/empty geometries are given the zone of the whole dataset.
+    """
+    bounds = shapely.bounds(geometry.values)
+    lon = (bounds[:, 0] + bounds[:, 2]) / 2
+    lat = (bounds[:, 1] + bounds[:, 3]) / 2
+
+    missing = np.isnan(lon) | np.isnan(lat)
+    if missing.any():
+        if missing.all():
+            lon[:], lat[:] = 0.0, 0.0
+        else:
+            lon[missing] = np.nanmean(lon)
+            lat[missing] = np.nanmean(lat)
+
+    return utm_epsg_codes(lon, lat)
+
+def warm_crs_cache() -> None:
+    """
+    Pre-load the CRSs in CRS_CACHE_WARM_EPSG, and the transformers between
+    them, so the first jobs on a worker skip the CRS database lookups.
+    """
+    for epsg in app_config.CRS_CACHE_WARM_EPSG:
+        crs_to_epsg(epsg)
+    for source, target in permutations(app_config.CRS_CACHE_WARM_EPSG, 2):
+        get_transformer(source, target)
+    logger.info(f"Warmed CRS cache for EPSG codes: {app_config.CRS_CACHE_WARM_EPSG}")
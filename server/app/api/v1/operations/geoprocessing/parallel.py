@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List
+import numpy as np
+
+def map_parallel(func: Callable, items: Iterable, workers: int) -> List:
+    """
+    Apply `func` to every item on a pool of `workers` threads, returning the
+    results in input order. With `workers <= 1` this runs inline.
+
+    Threads are enough here: shapely 2 releases the GIL inside GEOS, so
+    vectorized geometry operations on separate items run on separate cores.
+    """
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as pool:
+        return list(pool.map(func, items))
+
+def map_chunks(func: Callable[[np.ndarray], np.ndarray], values: np.ndarray, workers: int, chunk_size: int) -> np.ndarray:
+    """
+    Apply `func` to consecutive `chunk_size` slices of `values` on a pool of
+    `workers` threads and return the results concatenated in input order.
+    Small inputs, or `workers <= 1`, run inline without a pool.
+    """
+    if workers <= 1 or len(values) <= chunk_size:
+        return func(values)
+
+    chunks = [values[start:start + chunk_size] for start in range(0, len(values), chunk_size)]
+    return np.concatenate(map_parallel(func, chunks, workers))
@@ -2,76 +2,258 @@ import geopandas as gpd
 import pandas as pd
 import logging
 import os
+import re
 import zipfile
 import json
-from typing import Optional
+import ijson
+import pyogrio
+import pyarrow.parquet as pq
+import pyarrow.ipc as ipc
+import shapely
+import numpy as np
+from typing import Optional, List
+from shapely.geometry import shape, box
+from app.api.v1.operations.geoprocessing.crs import get_crs, reproject
+from app.core.config import config as app_config
 
 logger = logging.getLogger("api")
 
-def shp_to_gdf(input_zip_path: str) -> gpd.GeoDataFrame:
-    try:
-        # Get the directory where the zip file is located
-        extract_dir = os.path.dirname(input_zip_path)
+# number of GeoJSON features parsed into geometry/attribute arrays at a time
+GEOJSON_BATCH_SIZE = 10_000
+# number of CSV rows read and geometry-parsed at a time
+CSV_CHUNK_SIZE = 100_000
+
+def _read_vector(path: str, use_arrow: Optional[bool] = None, **kwargs) -> gpd.GeoDataFrame:
+    """
+    Read a GDAL vector source into a GeoDataFrame.
+
+    With `use_arrow` the features are pulled through pyogrio as an Arrow
+    stream and geometries are built from the WKB buffers in bulk, avoiding
+    per-feature Python objects. When not given, `READER_USE_ARROW` decides,
+    so both paths can be benchmarked against the same inputs.
+    """
+    if use_arrow is None:
+        use_arrow = app_config.READER_USE_ARROW
+
+    # GDAL evaluates `where` against the projected columns only, so any field the
+    # filter references has to be read as well and dropped again afterwards
+    filter_only_columns = []
+    if kwargs.get("columns") is not None and kwargs.get("where") is not None:
+        filter_only_columns = [
+            field for field in pyogrio.read_info(path)["fields"]
+            if field not in kwargs["columns"]
+            and re.search(rf"\b{re.escape(field)}\b", kwargs["where"], re.IGNORECASE)
+        ]
+        kwargs["columns"] = list(kwargs["columns"]) + filter_only_columns
+
+    if use_arrow:
+        gdf = gpd.read_file(path, engine="pyogrio", use_arrow=True, **kwargs)
+    else:
+        gdf = gpd.read_file(path, **kwargs)
+
+    if filter_only_columns:
+        gdf = gdf.drop(columns=filter_only_columns)
+    return gdf
+
+def _pushdown_kwargs(columns: Optional[List[str]] = None, bbox: Optional[List[float]] = None, where: Optional[str] = None) -> dict:
+    """
+    Build the read_file keyword arguments that let GDAL skip unneeded
+    attribute columns and features while reading.
+    """
+    kwargs = {}
+    if columns is not None:
+        kwargs["columns"] = columns
+    if bbox is not None:
+        kwargs["bbox"] = tuple(bbox)
+    if where is not None:
+        kwargs["where"] = where
+    return kwargs
+
+def _filter_bbox(gdf: gpd.GeoDataFrame, bbox: Optional[List[float]]) -> gpd.GeoDataFrame:
+    """
+    Keep only the features intersecting `bbox`, for readers that cannot push the filter down to GDAL.
+    """
+    if bbox is None:
+        return gdf
+    return gdf[gdf.geometry.intersects(box(*bbox))]
 
-        # Extract the zip file in-place
+def _set_missing_crs(gdf: gpd.GeoDataFrame, input_epsg: Optional[int]) -> gpd.GeoDataFrame:
+    if gdf.crs is None and input_epsg is not None:
+        gdf = gdf.set_crs(get_crs(input_epsg))
+    return gdf
+
+def _zip_shp_members(zip_ref: zipfile.ZipFile) -> list:
+    """
+    Return the archive paths of every .shp member (case-insensitive), skipping
+    macOS resource fork entries.
+    """
+    return [
+        name for name in zip_ref.namelist()
+        if name.lower().endswith(".shp") and not name.startswith("__MACOSX/")
+    ]
+
+def shp_to_gdf(input_zip_path: str, use_arrow: Optional[bool] = None, **pushdown) -> gpd.GeoDataFrame:
+    """
+    Load a zipped shapefile and return it as a GeoDataFrame.
+
+    The .shp/.dbf/.shx members are read straight out of the archive through
+    GDAL's /vsizip/ virtual filesystem, so nothing is extracted to disk. When
+    the archive holds several layers each one is read once and they are
+    combined (in the CRS of the first layer) with a `source_layer` column
+    recording where every feature came from. `pushdown` holds the optional
+    columns/bbox/where filters applied by GDAL while reading.
+    """
+    try:
         with zipfile.ZipFile(input_zip_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_dir)
+            shp_members = _zip_shp_members(zip_ref)
 
-        # Find the .shp file (case-insensitive)
-        shp_file = None
-        for filename in os.listdir(extract_dir):
-            if filename.lower().endswith('.shp'):
-                shp_file = os.path.join(extract_dir, filename)
-                break
+        if not shp_members:
+            raise FileNotFoundError("No .shp file found in zip archive.")
 
-        if not shp_file:
-            raise FileNotFoundError("No .shp file found in extracted archive.")
+        vsizip_root = f"/vsizip/{os.path.abspath(input_zip_path)}"
+        layers = []
+        for member in shp_members:
+            layer_gdf = _read_vector(f"{vsizip_root}/{member}", use_arrow, **_pushdown_kwargs(**pushdown))
+            layers.append((os.path.splitext(os.path.basename(member))[0], layer_gdf))
 
-        # Load the shapefile into a GeoDataFrame
-        gdf = gpd.read_file(shp_file)
+        if len(layers) == 1:
+            gdf = layers[0][1]
+        else:
+            target_crs = layers[0][1].crs
+            frames = []
+            for layer_name, layer_gdf in layers:
+                if target_crs is not None and layer_gdf.crs is not None and layer_gdf.crs != target_crs:
+                    layer_gdf = reproject(layer_gdf, target_crs)
+                frames.append(layer_gdf.assign(source_layer=layer_name))
+            gdf = gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs=target_crs)
     except Exception as e:
         logger.error(f"Error handling the zipped shape file: {e}")
         raise ValueError(f"Error handling zipped shape file: {e} - api usage as not been recorded.")
     
     return gdf
 
-def geojson_to_gdf(input_filepath: str) -> gpd.GeoDataFrame:
+def _geojson_batch_to_gdf(geometries: list, properties: list, bbox: Optional[List[float]] = None) -> gpd.GeoDataFrame:
+    """
+    Build a GeoDataFrame from one batch of parsed GeoJSON features.
+    """
+    batch = gpd.GeoDataFrame(
+        pd.DataFrame.from_records(properties, index=pd.RangeIndex(len(properties))),
+        geometry=gpd.GeoSeries(geometries, crs=get_crs(4326)),
+    )
+    return _filter_bbox(batch, bbox)
+
+def geojson_to_gdf(
+        input_filepath: str,
+        batch_size: int = GEOJSON_BATCH_SIZE,
+        use_arrow: Optional[bool] = None,
+        columns: Optional[List[str]] = None,
+        bbox: Optional[List[float]] = None,
+        where: Optional[str] = None
+    ) -> gpd.GeoDataFrame:
     """
     Load a GeoJSON FeatureCollection from `input_filepath`
     and return it as a GeoDataFrame in EPSG:4326.
+
+    Features are streamed from the file with ijson and converted to shapely
+    geometries and attribute columns `batch_size` features at a time, so the
+    FeatureCollection is never held in memory as one large Python dict.
+    When the Arrow read path is enabled, or an OGR SQL `where` filter is
+    given, GDAL parses the file instead.
     """
+    if use_arrow is None:
+        use_arrow = app_config.READER_USE_ARROW
+
     try:
-        # Read the GeoJSON file into a dict
-        with open(input_filepath, "r", encoding="utf-8") as f:
-            geojson_dict = json.load(f)
-
-        # Basic validation
-        if geojson_dict.get("type") != "FeatureCollection":
-            raise ValueError("Invalid GeoJSON: expected a FeatureCollection.")
-
-        # Build the GeoDataFrame (GeoPandas handles geometry parsing)
-        gdf = gpd.GeoDataFrame.from_features(
-            geojson_dict["features"],
-            crs="EPSG:4326"   # Set the CRS explicitly
-        )
+        if use_arrow or where is not None:
+            gdf = _read_vector(input_filepath, use_arrow, **_pushdown_kwargs(columns, bbox, where))
+            return gdf.set_crs(get_crs(4326), allow_override=True)
 
-        return gdf
+        with open(input_filepath, "rb") as f:
+            # Basic validation - "type" is normally the first key so this stops early
+            geojson_type = next(ijson.items(f, "type"), None)
+            if geojson_type != "FeatureCollection":
+                raise ValueError("Invalid GeoJSON: expected a FeatureCollection.")
+            f.seek(0)
+
+            frames = []
+            geometries, properties = [], []
+            for feature in ijson.items(f, "features.item", use_float=True):
+                geometry = feature.get("geometry")
+                geometries.append(shape(geometry) if geometry else None)
+                feature_properties = feature.get("properties") or {}
+                if columns is not None:
+                    feature_properties = {col: feature_properties.get(col) for col in columns}
+                properties.append(feature_properties)
+
+                if len(geometries) >= batch_size:
+                    frames.append(_geojson_batch_to_gdf(geometries, properties, bbox))
+                    geometries, properties = [], []
+
+            if geometries or not frames:
+                frames.append(_geojson_batch_to_gdf(geometries, properties, bbox))
+
+        if len(frames) == 1:
+            return frames[0].reset_index(drop=True)
+
+        return gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs=get_crs(4326))
 
     except Exception as e:
         raise ValueError(f"Error converting GeoJSON to GeoDataFrame: {e}")
 
-def dxf_to_gdf(input_filepath: str, input_epsg: int) -> gpd.GeoDataFrame:
+def dxf_to_gdf(input_filepath: str, input_epsg: int, use_arrow: Optional[bool] = None, **pushdown) -> gpd.GeoDataFrame:
     try:
-        gdf = gpd.read_file(input_filepath)
-        gdf.crs = input_epsg
+        gdf = _read_vector(input_filepath, use_arrow, **_pushdown_kwargs(**pushdown))
+        gdf = gdf.set_crs(get_crs(input_epsg), allow_override=True)
     except Exception as e:
         logger.error(f"Error handling the DXF file: {e}")
         raise ValueError(f"Error handling DXF file: {e} - api usage as not been recorded.")
     return gdf
 
-def csv_to_gdf(input_filepath: str, input_epsg: int, wkt_col: str = "geom_wkt", encoding: Optional[str] = "utf-8") -> gpd.GeoDataFrame:
+def _parse_csv_geometry(values: pd.Series, geom_format: str) -> np.ndarray:
+    """
+    Vectorized parse of one chunk of WKT or hex-WKB strings. Missing or
+    unparseable values come back as None.
+    """
+    values = values.to_numpy(dtype=object, copy=True)
+    values[pd.isna(values)] = None
+    if geom_format == "wkb":
+        return shapely.from_wkb(values, on_invalid="ignore")
+    return shapely.from_wkt(values, on_invalid="ignore")
+
+def fgb_to_gdf(input_filepath: str, input_epsg: Optional[int] = None, use_arrow: Optional[bool] = None, **pushdown) -> gpd.GeoDataFrame:
+    """
+    Load a FlatGeobuf file into a GeoDataFrame.
+
+    A bbox filter is answered from the file's packed Hilbert R-tree, so only
+    the matching features are read. `input_epsg` is only used if the file
+    carries no CRS.
+    """
+    try:
+        gdf = _read_vector(input_filepath, use_arrow, **_pushdown_kwargs(**pushdown))
+        gdf = _set_missing_crs(gdf, input_epsg)
+    except Exception as e:
+        logger.error(f"Error handling the FlatGeobuf file: {e}")
+        raise ValueError(f"Error handling FlatGeobuf file: {e} - api usage as not been recorded.")
+    return gdf
+
+def csv_to_gdf(
+        input_filepath: str,
+        input_epsg: int,
+        wkt_col: str = "geom_wkt",
+        encoding: Optional[str] = "utf-8",
+        columns: Optional[List[str]] = None,
+        bbox: Optional[List[float]] = None,
+        wkb_col: str = "geom_wkb",
+        chunk_size: int = CSV_CHUNK_SIZE
+    ) -> gpd.GeoDataFrame:
     """
-    Load a CSV file where geometry is stored as WKT in `wkt_col` and return a GeoDataFrame.
+    Load a CSV file where geometry is stored as WKT in `wkt_col` (or as
+    hex-encoded WKB in `wkb_col`) and return a GeoDataFrame.
+
+    The file is read `chunk_size` rows at a time and each chunk's geometry is
+    parsed with shapely's vectorized ``from_wkt``/``from_wkb``, so the parse
+    overhead stays bounded by the chunk size and bad rows are collected in
+    the same pass.
 
     Parameters
     ----------
@@ -83,16 +265,27 @@ def csv_to_gdf(input_filepath: str, input_epsg: int, wkt_col: str = "geom_wkt",
         Column name containing WKT geometries.
     encoding : Optional[str], default "utf-8"
         File encoding for the CSV. Try "utf-8-sig" or "latin-1" if needed.
+    columns : Optional[List[str]], default None
+        Attribute columns to load (passed to ``pd.read_csv`` as ``usecols``).
+        The geometry column is always read. ``None`` loads every column.
+    bbox : Optional[List[float]], default None
+        ``[minx, miny, maxx, maxy]`` in the input CRS; only features
+        intersecting it are kept.
+    wkb_col : str, default "geom_wkb"
+        Column name containing hex-encoded WKB geometries. Used instead of
+        `wkt_col` when present, as WKB parses considerably faster.
+    chunk_size : int, default CSV_CHUNK_SIZE
+        Number of rows read and parsed at a time.
 
     Returns
     -------
     geopandas.GeoDataFrame
-        GeoDataFrame with geometries parsed from WKT and CRS set to EPSG:input_epsg.
+        GeoDataFrame with parsed geometries and CRS set to EPSG:input_epsg.
 
     Raises
     ------
     ValueError
-        If the file is missing, the WKT column is absent, EPSG is invalid,
+        If the file is missing, the geometry column is absent, EPSG is invalid,
         or geometries cannot be parsed.
     """
     # --- Basic validation
@@ -102,9 +295,9 @@ def csv_to_gdf(input_filepath: str, input_epsg: int, wkt_col: str = "geom_wkt",
     if not os.path.exists(input_filepath):
         raise ValueError(f"CSV file not found: {input_filepath}")
 
-    # --- Read CSV
+    # --- Work out which geometry column to parse from the header
     try:
-        df = pd.read_csv(input_filepath, encoding=encoding)
+        header = pd.read_csv(input_filepath, encoding=encoding, nrows=0).columns
     except UnicodeDecodeError as e:
         raise ValueError(
             f"Failed to read CSV with encoding '{encoding}': {e}. "
@@ -113,63 +306,188 @@ def csv_to_gdf(input_filepath: str, input_epsg: int, wkt_col: str = "geom_wkt",
     except Exception as e:
         raise ValueError(f"Error reading CSV: {e}")
 
-    if df.empty:
-        raise ValueError("CSV loaded but contains no rows.")
+    if wkb_col in header:
+        geom_col, geom_format = wkb_col, "wkb"
+    elif wkt_col in header:
+        geom_col, geom_format = wkt_col, "wkt"
+    else:
+        raise ValueError(
+            f"Required WKT column '{wkt_col}' (or hex-WKB column '{wkb_col}') "
+            f"not found in CSV columns: {list(header)}"
+        )
+    # a second geometry encoding of the same rows is not an attribute
+    drop_cols = [col for col in (wkt_col, wkb_col) if col in header]
 
-    if wkt_col not in df.columns:
-        raise ValueError(f"Required WKT column '{wkt_col}' not found in CSV columns: {list(df.columns)}")
+    usecols = None
+    if columns is not None:
+        wanted = set(columns) | {geom_col}
+        usecols = lambda col: col in wanted
 
-    # --- Parse WKT → geometry
+    # --- Read and parse chunk by chunk
+    frames = []
+    total_rows = 0
+    invalid_count = 0
+    bad_indices = []
     try:
-        # geopandas has a helper for WKT parsing
-        geometry = gpd.GeoSeries.from_wkt(df[wkt_col], errors="coerce")
-    except Exception:
-        # Fallback if older versions behave differently
-        try:
-            from shapely import wkt as _wkt
-            geometry = df[wkt_col].astype(str).apply(lambda s: _wkt.loads(s) if s and s.strip() else None)
-            geometry = gpd.GeoSeries(geometry)
-        except Exception as e:
-            raise ValueError(f"Failed to parse WKT from column '{wkt_col}': {e}")
+        reader = pd.read_csv(
+            input_filepath,
+            encoding=encoding,
+            usecols=usecols,
+            dtype={geom_col: object},
+            chunksize=chunk_size
+        )
+        with reader:
+            for chunk in reader:
+                total_rows += len(chunk)
+                geometry = _parse_csv_geometry(chunk[geom_col], geom_format)
+
+                invalid_mask = shapely.is_missing(geometry)
+                chunk_invalid = int(invalid_mask.sum())
+                if chunk_invalid:
+                    invalid_count += chunk_invalid
+                    if len(bad_indices) < 10:
+                        bad_indices.extend(chunk.index[invalid_mask][:10 - len(bad_indices)].tolist())
+
+                # once a bad row is found the load fails, so stop keeping chunks
+                if invalid_count:
+                    continue
+
+                chunk_gdf = gpd.GeoDataFrame(
+                    chunk.drop(columns=[col for col in drop_cols if col in chunk.columns]),
+                    geometry=geometry,
+                    crs=get_crs(input_epsg)
+                )
+                frames.append(_filter_bbox(chunk_gdf, bbox))
+    except UnicodeDecodeError as e:
+        raise ValueError(
+            f"Failed to read CSV with encoding '{encoding}': {e}. "
+            "Try encoding='utf-8-sig' or 'latin-1'."
+        )
+    except Exception as e:
+        raise ValueError(f"Error reading CSV: {e}")
+
+    if total_rows == 0:
+        raise ValueError("CSV loaded but contains no rows.")
 
     # --- Validate parsed geometry
-    invalid_mask = geometry.isna()
-    invalid_count = int(invalid_mask.sum())
-    if invalid_count == len(geometry):
+    encoding_name = "WKB" if geom_format == "wkb" else "WKT"
+    if invalid_count == total_rows:
         raise ValueError(
-            f"Failed to parse any valid geometries from '{wkt_col}'. "
-            "Check WKT strings and delimiter/quoting in the CSV."
+            f"Failed to parse any valid geometries from '{geom_col}'. "
+            f"Check {encoding_name} strings and delimiter/quoting in the CSV."
         )
     elif invalid_count > 0:
         # You can choose to raise or drop. For safety, raise with a helpful message.
-        bad_indices = df.index[invalid_mask].tolist()[:10]  # show up to 10
         raise ValueError(
-            f"{invalid_count} row(s) have invalid WKT in '{wkt_col}'. "
+            f"{invalid_count} row(s) have invalid {encoding_name} in '{geom_col}'. "
             f"Examples of bad row indices: {bad_indices}. "
             "Fix the input or pre-clean before loading."
         )
 
     # --- Build GeoDataFrame
     try:
-        gdf = gpd.GeoDataFrame(
-            df.drop(columns=[wkt_col]),
-            geometry=geometry,
-            crs=f"EPSG:{input_epsg}"
-        )
+        gdf = gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs=get_crs(input_epsg))
     except Exception as e:
         raise ValueError(f"Failed to create GeoDataFrame: {e}")
 
     return gdf
 
-def input_to_gdf(input_format: str, input_filepath: str = None, input_epsg: int = None) -> gpd.GeoDataFrame:
+def _geo_metadata(schema) -> dict:
+    """
+    Return the GeoParquet "geo" metadata stored in an Arrow/Parquet schema.
+    """
+    if not schema.metadata or b"geo" not in schema.metadata:
+        raise ValueError("Missing GeoParquet 'geo' metadata - the file was not written as a GeoDataFrame.")
+    return json.loads(schema.metadata[b"geo"])
+
+def _arrow_read_columns(geo_metadata: dict, columns: Optional[List[str]]) -> Optional[List[str]]:
+    """
+    Add the primary geometry column to a requested attribute projection.
+    """
+    if columns is None:
+        return None
+    geometry_col = geo_metadata["primary_column"]
+    return [col for col in columns if col != geometry_col] + [geometry_col]
+
+def parquet_to_gdf(
+        input_filepath: str,
+        input_epsg: Optional[int] = None,
+        columns: Optional[List[str]] = None,
+        bbox: Optional[List[float]] = None
+    ) -> gpd.GeoDataFrame:
+    """
+    Load a GeoParquet file into a GeoDataFrame.
+
+    Only the requested columns are read. The bbox filter is pushed down to the
+    row groups when the file has a bbox covering column (as Geoflip writes
+    them), and applied after reading otherwise. `input_epsg` is only used if
+    the file carries no CRS.
+    """
+    try:
+        geo_metadata = _geo_metadata(pq.read_schema(input_filepath))
+        primary = geo_metadata["columns"][geo_metadata["primary_column"]]
+        has_covering = "covering" in primary
+
+        gdf = gpd.read_parquet(
+            input_filepath,
+            columns=_arrow_read_columns(geo_metadata, columns),
+            bbox=tuple(bbox) if bbox is not None and has_covering else None
+        )
+        if not has_covering:
+            gdf = _filter_bbox(gdf, bbox)
+        gdf = _set_missing_crs(gdf, input_epsg)
+    except Exception as e:
+        logger.error(f"Error handling the GeoParquet file: {e}")
+        raise ValueError(f"Error handling GeoParquet file: {e} - api usage as not been recorded.")
+    return gdf.reset_index(drop=True)
+
+def feather_to_gdf(
+        input_filepath: str,
+        input_epsg: Optional[int] = None,
+        columns: Optional[List[str]] = None,
+        bbox: Optional[List[float]] = None
+    ) -> gpd.GeoDataFrame:
+    """
+    Load a Feather / Arrow IPC file written from a GeoDataFrame.
+
+    Only the requested columns are read; the bbox filter is applied after
+    reading. `input_epsg` is only used if the file carries no CRS.
+    """
+    try:
+        with ipc.open_file(input_filepath) as ipc_reader:
+            geo_metadata = _geo_metadata(ipc_reader.schema)
+
+        gdf = gpd.read_feather(input_filepath, columns=_arrow_read_columns(geo_metadata, columns))
+        gdf = _filter_bbox(gdf, bbox)
+        gdf = _set_missing_crs(gdf, input_epsg)
+    except Exception as e:
+        logger.error(f"Error handling the Feather file: {e}")
+        raise ValueError(f"Error handling Feather file: {e} - api usage as not been recorded.")
+    return gdf.reset_index(drop=True)
+
+def input_to_gdf(
+		input_format: str,
+		input_filepath: str = None,
+		input_epsg: int = None,
+		use_arrow: Optional[bool] = None,
+		columns: Optional[List[str]] = None,
+		bbox: Optional[List[float]] = None,
+		where: Optional[str] = None
+	) -> gpd.GeoDataFrame:
 	match input_format:
 		case "shp":
-			return shp_to_gdf(input_filepath)
+			return shp_to_gdf(input_filepath, use_arrow=use_arrow, columns=columns, bbox=bbox, where=where)
 		case "geojson":
-			return geojson_to_gdf(input_filepath)
+			return geojson_to_gdf(input_filepath, use_arrow=use_arrow, columns=columns, bbox=bbox, where=where)
 		case "dxf":
-			return dxf_to_gdf(input_filepath, input_epsg)
+			return dxf_to_gdf(input_filepath, input_epsg, use_arrow=use_arrow, columns=columns, bbox=bbox, where=where)
 		case "csv":
-			return csv_to_gdf(input_filepath, input_epsg)
+			return csv_to_gdf(input_filepath, input_epsg, columns=columns, bbox=bbox)
+		case "fgb":
+			return fgb_to_gdf(input_filepath, input_epsg, use_arrow=use_arrow, columns=columns, bbox=bbox, where=where)
+		case "parquet":
+			return parquet_to_gdf(input_filepath, input_epsg, columns=columns, bbox=bbox)
+		case "feather":
+			return feather_to_gdf(input_filepath, input_epsg, columns=columns, bbox=bbox)
 		case _:
 			raise ValueError(f"Unsupported file type: {type}")
\ No newline at end of file
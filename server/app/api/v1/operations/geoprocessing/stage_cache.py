@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+import geopandas as gpd
+from app.core.config import config as app_config
+
+logger = logging.getLogger("api")
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def _cache_dir() -> str:
+    return os.path.join(app_config.DATA_PATH, "stage_cache")
+
+def _stage_path(key: str) -> str:
+    return os.path.join(_cache_dir(), f"{key}.parquet")
+
+def _is_expired(stat: os.stat_result, max_age: int) -> bool:
+    return time.time() - stat.st_mtime > max_age
+
+def file_digest(path: str) -> str:
+    """
+    sha256 of a file's content, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def stage_key(input_digest: str, input_options: Dict, transformations: List[Dict], crs_policy: Optional[str] = None) -> str:
+    """
+    Cache key of the data after the given prefix of transformations.
+
+    `input_options` holds everything that changes how the input is parsed
+    (format, EPSG, column/bbox/where pushdown). Stages after the input also
+    depend on how the pipeline picks its working CRS, passed as `crs_policy`
+    (see transformation_manager.crs_policy).
+    """
+    canonical = json.dumps(
+        {
+            "input": input_digest,
+            "options": input_options,
+            "transformations": transformations,
+            "crs_policy": crs_policy if transformations else None
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def load_stage(key: str) -> Optional[gpd.GeoDataFrame]:
+    """
+    Cached GeoDataFrame for `key`, or None on a miss. Entries not used for
+    JOB_EXPIRY_TIME are expired like job data; a hit marks the entry as
+    recently used.
+    """
+    path = _stage_path(key)
+    try:
+        if _is_expired(os.stat(path), app_config.JOB_EXPIRY_TIME):
+            os.remove(path)
+            return None
+        gdf = gpd.read_parquet(path)
+        os.utime(path)
+        return gdf
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        # evicted while reading, or a partial file left by a crashed worker
+        logger.warning(f"Ignoring unreadable stage cache entry {key}: {e}")
+        return None
+
+def load_longest_prefix(keys: List[str]) -> Tuple[int, Optional[gpd.GeoDataFrame]]:
+    """
+    Look up the stage keys from the longest prefix down and return the number
+    of transformations the first hit covers together with its data, or
+    (-1, None) when nothing is cached.
+    """
+    for completed in range(len(keys) - 1, -1, -1):
+        gdf = load_stage(keys[completed])
+        if gdf is not None:
+            return completed, gdf
+    return -1, None
+
+def save_stage(key: str, gdf: gpd.GeoDataFrame) -> None:
+    """
+    Store a stage result as GeoParquet and evict expired entries and least
+    recently used entries beyond STAGE_CACHE_MAX_BYTES. Failures are logged and otherwise ignored;
+    the cache is only an optimization.
+    """
+    os.makedirs(_cache_dir(), exist_ok=True)
+    path = _stage_path(key)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        gdf.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(f"Could not cache stage {key}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+
+    evict_stages(app_config.STAGE_CACHE_MAX_BYTES, app_config.JOB_EXPIRY_TIME)
+
+def evict_stages(max_bytes: int, max_age: int) -> None:
+    """
+    Delete cache entries not used for `max_age` seconds, then the least
+    recently used entries until the cache fits in `max_bytes`.
+    """
+    if not os.path.isdir(_cache_dir()):
+        return
+
+    entries = []
+    for entry in os.scandir(_cache_dir()):
+        if entry.is_file() and entry.name.endswith(".parquet"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path, _is_expired(stat, max_age)))
+
+    total = sum(size for _, size, _, _ in entries)
+    for _, size, path, expired in sorted(entries):
+        if total <= max_bytes and not expired:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
@@ -1,18 +1,114 @@
 import logging
-from typing import List, Tuple, Dict
+from typing import Callable, List, Tuple, Dict, Optional
 import geopandas as gpd
+import numpy as np
 from fastapi import HTTPException
 
 from app.api.v1.operations.geoprocessing.buffer import apply_buffer
-from app.api.v1.operations.geoprocessing.union import apply_union
+from app.api.v1.operations.geoprocessing.crs import get_crs, crs_to_epsg, reproject, feature_utm_epsg_codes
+from app.api.v1.operations.geoprocessing.union import apply_union, apply_buffer_union
 
 logger = logging.getLogger("api")
 
-def apply_transformations(gdf: gpd.GeoDataFrame, transformations: List[Dict]) -> Tuple[gpd.GeoDataFrame, List[str]]:
-    """Apply transformations to a GeoDataFrame based on the request data."""
+def _crs_name(crs) -> Optional[str]:
+    if crs is None:
+        return None
+    epsg = crs_to_epsg(crs)
+    return f"EPSG:{epsg}" if epsg is not None else get_crs(crs).srs
+
+def crs_policy(transformations: List[Dict]) -> str:
+    """
+    How plan_transformations picks the working CRS for a transformation list:
+    "utm" when it contains a buffer, "input" otherwise.
+    """
+    return "utm" if any(transform["type"] == "buffer" for transform in transformations) else "input"
+
+def plan_transformations(gdf: gpd.GeoDataFrame, transformations: List[Dict], output_epsg: Optional[int] = None) -> Dict:
+    """
+    Choose the single CRS the whole transformation pipeline runs in, so the
+    data is reprojected at most once on the way in and once on the way out
+    (by the writer, to `output_epsg`).
+
+    - Geographic data with a buffer runs in the UTM zone of the data when all
+      features fall in one zone, rather than apply_buffer going to UTM and
+      back and the writer reprojecting again.
+    - Geographic data spanning several UTM zones stays in the input CRS and
+      apply_buffer buffers each zone in its own projection; those per-zone
+      round trips are listed in the plan's reprojections for every buffer.
+    - Everything else runs in the input CRS.
+    """
+    input_crs = gdf.crs
+    working_crs = input_crs
+    reason = "transformations run in the input CRS"
+    buffer_zones = []
+
+    if crs_policy(transformations) == "utm" and input_crs is not None and get_crs(input_crs).is_geographic and len(gdf) > 0:
+        zones = np.unique(feature_utm_epsg_codes(gdf.geometry))
+        if len(zones) == 1:
+            working_crs = f"EPSG:{int(zones[0])}"
+            reason = "buffer on geographic data: the pipeline runs in the UTM zone of the data"
+        else:
+            reason = f"data spans {len(zones)} UTM zones: buffer reprojects each zone"
+            buffer_zones = [f"EPSG:{int(zone)}" for zone in zones]
+
+    input_name, working_name = _crs_name(input_crs), _crs_name(working_crs)
+    output_name = f"EPSG:{output_epsg}" if output_epsg is not None else None
+
+    reprojections = []
+    if working_name != input_name:
+        reprojections.append(f"{input_name} -> {working_name}")
+    for transform in transformations:
+        if transform["type"] == "buffer":
+            for zone in buffer_zones:
+                reprojections.append(f"{working_name} -> {zone} (buffer)")
+                reprojections.append(f"{zone} -> {working_name} (buffer)")
+    if output_name is not None and output_name != working_name:
+        reprojections.append(f"{working_name} -> {output_name}")
+
+    return {
+        "input_crs": input_name,
+        "working_crs": working_name,
+        "output_crs": output_name,
+        "reprojections": reprojections,
+        "reason": reason
+    }
+
+def _fuses_with_buffer(transform: Optional[Dict]) -> bool:
+    """
+    Whether `transform` can run fused with the buffer before it.
+    """
+    if transform is None or transform["type"] != "union":
+        return False
+    params = transform.get("params") or {}
+    return not params.get("coverage")
+
+def apply_transformations(
+        gdf: gpd.GeoDataFrame,
+        transformations: List[Dict],
+        output_epsg: Optional[int] = None,
+        on_stage: Optional[Callable[[int, gpd.GeoDataFrame], None]] = None
+    ) -> Tuple[gpd.GeoDataFrame, List[str], Dict]:
+    """
+    Apply transformations to a GeoDataFrame based on the request data.
+
+    The pipeline is planned first (see plan_transformations) and the data is
+    reprojected into the planned working CRS once, up front. A buffer
+    immediately followed by a (non-coverage) union runs as one fused
+    operator. `on_stage` is called with the number of transformations done
+    so far and the data after each stage. Returns the result, the
+    transformations applied and the plan.
+    """
+    plan = plan_transformations(gdf, transformations, output_epsg)
+    logger.info(f"Transformation plan: {plan}")
+
     transformations_applied = []
     output_gdf = gdf
-    for transform in transformations:
+    if plan["working_crs"] != plan["input_crs"]:
+        output_gdf = reproject(output_gdf, plan["working_crs"])
+    fused = set()
+    for i, transform in enumerate(transformations):
+        if i in fused:
+            continue
         match transform["type"]:
             case "buffer":
                 params = transform['params']
@@ -26,12 +122,24 @@ def apply_transformations(gdf: gpd.GeoDataFrame, transformations: List[Dict]) ->
                     # of 3% of the buffer distance
                     simplify_tolerance = None
 
+                next_transform = transformations[i + 1] if i + 1 < len(transformations) else None
+                if _fuses_with_buffer(next_transform):
+                    output_gdf = apply_buffer_union(output_gdf, distance, units, simplify_tolerance=simplify_tolerance)
+                    fused.add(i + 1)
+
+                    # calculate units consumed for the buffer and the dissolve
+                    transformations_applied.extend(["buffer", "union"])
+                    if on_stage is not None:
+                        on_stage(i + 2, output_gdf)
+                    continue
+
                 output_gdf = apply_buffer(output_gdf, distance, units, simplify_tolerance=simplify_tolerance)
 
                 # calculate units consumed for buffers
                 transformations_applied.append("buffer")
             case "union":
-                output_gdf = apply_union(output_gdf)
+                params = transform.get("params") or {}
+                output_gdf = apply_union(output_gdf, coverage=params.get("coverage"))
 
                 # calculate units consumed for dissolve
                 transformations_applied.append("union")
@@ -40,4 +148,7 @@ def apply_transformations(gdf: gpd.GeoDataFrame, transformations: List[Dict]) ->
                 logger.error(error_message)
                 raise HTTPException(status_code=400, detail=error_message)
 
-    return output_gdf, transformations_applied
+        if on_stage is not None:
+            on_stage(i + 1, output_gdf)
+
+    return output_gdf, transformations_applied, plan
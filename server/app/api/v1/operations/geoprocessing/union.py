@@ -1,23 +1,32 @@
+import logging
 import geopandas as gpd
+import numpy as np
 import pandas as pd
+import shapely
+from typing import Optional
+from shapely import GeometryType
 from shapely.geometry import Polygon, MultiPolygon
 from shapely.ops import unary_union
 from shapely.geometry.base import BaseGeometry
+from app.api.v1.operations.geoprocessing.buffer import buffer_geometry
+from app.api.v1.operations.geoprocessing.parallel import map_parallel
+from app.core.config import config as app_config
 
-def _is_polygonal(geom: BaseGeometry) -> bool:
-    return isinstance(geom, (Polygon, MultiPolygon))
+logger = logging.getLogger("api")
 
-def apply_union(input_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+def _all_polygonal(geometry: gpd.GeoSeries) -> bool:
+    type_ids = shapely.get_type_id(np.asarray(geometry.values))
+    return bool(np.isin(type_ids, [GeometryType.POLYGON, GeometryType.MULTIPOLYGON]).all())
+
+def _is_start_column(colname: str) -> bool:
+    name_lower = (colname or "").lower()
+    return name_lower.startswith("start") or name_lower.endswith("start") or "start_" in name_lower
+
+def _union_parts(geometry: gpd.GeoSeries) -> np.ndarray:
     """
-    Union overlapping polygons, preserving non-overlapping polygons,
-    and aggregate attributes sensibly by dtype.
+    Union all geometries and return the individual output polygons.
     """
-    # 0) Guard: polygonal only
-    if not all(_is_polygonal(geom) for geom in input_gdf.geometry):
-        raise ValueError("All geometries must be polygons or multipolygons to apply union.")
-
-    # 1) Build the unioned geometry and extract individual polygons
-    u = unary_union(input_gdf.geometry)
+    u = unary_union(geometry)
     if isinstance(u, Polygon):
         unioned_polygons = [u]
     elif isinstance(u, MultiPolygon):
@@ -26,82 +35,262 @@ def apply_union(input_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
         # GeometryCollection etc. — keep only polygonal parts
         unioned_polygons = [g for g in getattr(u, "geoms", []) if isinstance(g, (Polygon, MultiPolygon))]
 
-    # 2) Optional: create an sindex for speed
-    try:
-        sindex = input_gdf.sindex
-    except Exception:
-        sindex = None
-
-    # 3) Helper: attribute aggregation per column based on dtype
-    def aggregate_column(series: pd.Series, colname: str):
-        s = series.dropna()
-        if s.empty:
-            # preserve dtype-ish nulls
-            if pd.api.types.is_datetime64_any_dtype(series):
-                return pd.NaT
-            return None
-
-        if pd.api.types.is_numeric_dtype(series):
-            # numeric → sum
-            return s.sum()
-
-        if pd.api.types.is_bool_dtype(series):
-            # booleans → any (or use .all() if that fits better)
-            return bool(s.any())
-
-        if pd.api.types.is_datetime64_any_dtype(series):
-            # datetimes → min for "start*", max for "end*", else max
-            name_lower = (colname or "").lower()
-            if name_lower.startswith("start") or name_lower.endswith("start") or "start_" in name_lower:
-                return s.min()
-            if name_lower.startswith("end") or name_lower.endswith("end") or "end_" in name_lower:
-                return s.max()
-            return s.max()
-
-        if pd.api.types.is_timedelta64_dtype(series):
-            # durations → sum
-            return s.sum()
-
-        if pd.api.types.is_categorical_dtype(series):
-            # categoricals → unique values as comma list
-            return ", ".join(pd.unique(s.astype(str)))
-
-        # objects/strings and anything else → unique join
-        return ", ".join(pd.unique(s.astype(str)))
-
-    result_rows = []
-
-    # 4) For each output polygon, find intersecting inputs and aggregate attributes
-    for poly in unioned_polygons:
-        if sindex is not None:
-            # fast bbox filter, then exact intersects
-            idx = list(sindex.query(poly, predicate="intersects"))
-            intersecting = input_gdf.iloc[idx]
-            if not intersecting.empty:
-                intersecting = intersecting[intersecting.geometry.intersects(poly)]
-        else:
-            intersecting = input_gdf[input_gdf.geometry.intersects(poly)]
+    parts = np.empty(len(unioned_polygons), dtype=object)
+    parts[:] = unioned_polygons
+    return parts
 
-        if intersecting.empty:
-            # shouldn't normally happen, but be robust
-            attrs = {col: None for col in input_gdf.columns if col != "geometry"}
+def _polygon_parts(geometry: BaseGeometry) -> np.ndarray:
+    """
+    Split a union result into its individual polygons.
+    """
+    parts = shapely.get_parts(geometry)
+    return parts[shapely.get_type_id(parts) == GeometryType.POLYGON]
+
+def _connected_components(n: int, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """
+    Label the connected components of an undirected graph of `n` nodes given
+    as edge lists (union-find with path halving).
+    """
+    parent = np.arange(n)
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a, b in zip(left, right):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+
+    return np.array([find(i) for i in range(n)])
+
+def _tiled_union_parts(geometry: gpd.GeoSeries, workers: int, partition_size: int) -> np.ndarray:
+    """
+    Union the geometries partition by partition and return the individual output polygons.
+
+    1. Geometries are ordered along a Hilbert curve and cut into runs of
+       `partition_size`, giving spatially compact partitions.
+    2. Each partition is unioned on its own, in parallel on `workers` threads.
+    3. Only the partial polygons that intersect a polygon from another
+       partition (i.e. that cross a partition border) are grouped into
+       connected components and unioned again; the rest pass straight through.
+
+    The resulting polygons are the same as a single-shot union of all
+    geometries, though not necessarily in the same order.
+    """
+    geometry = geometry[~(geometry.isna() | geometry.is_empty)]
+    if geometry.empty:
+        return np.empty(0, dtype=object)
+
+    values = np.asarray(geometry.values)
+    order = np.argsort(geometry.hilbert_distance().to_numpy(), kind="stable")
+    partitions = [values[order[start:start + partition_size]] for start in range(0, len(values), partition_size)]
+
+    # 2) union each partition independently
+    partial_parts = map_parallel(lambda partition: _polygon_parts(shapely.union_all(partition)), partitions, workers)
+    pieces = np.concatenate(partial_parts)
+    piece_partition = np.repeat(np.arange(len(partial_parts)), [len(p) for p in partial_parts])
+
+    # 3) merge only the pieces that cross partition borders
+    left, right = shapely.STRtree(pieces).query(pieces, predicate="intersects")
+    crossing = piece_partition[left] != piece_partition[right]
+    left, right = left[crossing], right[crossing]
+    if len(left) == 0:
+        return pieces
+
+    border = np.unique(np.concatenate([left, right]))
+    position = np.full(len(pieces), -1)
+    position[border] = np.arange(len(border))
+    labels = _connected_components(len(border), position[left], position[right])
+
+    components = [pieces[border[labels == label]] for label in np.unique(labels)]
+    merged_parts = map_parallel(lambda component: _polygon_parts(shapely.union_all(component)), components, workers)
+
+    untouched = np.ones(len(pieces), dtype=bool)
+    untouched[border] = False
+    return np.concatenate([pieces[untouched]] + merged_parts)
+
+def _coverage_union_parts(geometry: gpd.GeoSeries) -> np.ndarray:
+    """
+    Dissolve a valid polygon coverage (no overlaps, shared edges matching
+    exactly) and return the individual output polygons. GEOS merges the
+    shared edges directly instead of running the general overlay.
+    """
+    values = np.asarray(geometry.values)
+    values = values[~shapely.is_empty(values)]
+    if len(values) == 0:
+        return np.empty(0, dtype=object)
+    return _polygon_parts(shapely.coverage_union_all(values))
+
+def _aggregate_attributes(attributes: pd.DataFrame, geometry: gpd.GeoSeries, parts: np.ndarray) -> pd.DataFrame:
+    """
+    Aggregate the attributes of every input feature intersecting each output
+    polygon, returning one row per entry of `parts`.
+
+    The part -> input mapping comes from a single bulk spatial index query
+    and each dtype family is aggregated with one groupby:
+
+    - numeric (including bool) → sum
+    - datetimes → min for "start*" columns, max for "end*" and everything else
+    - timedeltas → sum
+    - categoricals / objects / strings → unique values joined with ", "
+
+    Parts with no intersecting input (or only nulls) get nulls.
+    """
+    n_parts = len(parts)
+    part_index = pd.RangeIndex(n_parts)
+    aggregated = pd.DataFrame(index=part_index)
+    if attributes.shape[1] == 0:
+        return aggregated
+
+    # 1) part -> intersecting input rows, in one query over all parts
+    part_idx, input_idx = geometry.sindex.query(parts, predicate="intersects")
+    joined = attributes.iloc[input_idx].reset_index(drop=True)
+    grouped = joined.groupby(part_idx, sort=True)
+
+    numeric_cols, datetime_cols, timedelta_cols, text_cols = [], [], [], []
+    for col in attributes.columns:
+        dtype = attributes[col].dtype
+        if pd.api.types.is_numeric_dtype(dtype):
+            numeric_cols.append(col)
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            datetime_cols.append(col)
+        elif pd.api.types.is_timedelta64_dtype(dtype):
+            timedelta_cols.append(col)
         else:
-            attrs = {}
-            for col in input_gdf.columns:
-                if col == "geometry":
-                    continue
-                attrs[col] = aggregate_column(intersecting[col], col)
-
-        attrs["geometry"] = poly
-        result_rows.append(attrs)
-
-    # 5) Build GeoDataFrame; ensure the same columns order as input
-    # (any missing keys will default to None/NaT)
-    unioned_gdf = gpd.GeoDataFrame(result_rows, crs=input_gdf.crs)
-    # Reorder and reinsert missing columns
-    for col in input_gdf.columns:
-        if col not in unioned_gdf.columns:
-            unioned_gdf[col] = pd.NaT if pd.api.types.is_datetime64_any_dtype(input_gdf[col]) else None
+            text_cols.append(col)
+
+    results = {}
+
+    # 2) numeric → sum (null when there is nothing to add up)
+    if numeric_cols:
+        results.update(grouped[numeric_cols].sum(min_count=1).reindex(part_index).items())
+
+    # 3) datetimes → min for "start*", max for "end*", else max
+    if datetime_cols:
+        start_cols = [col for col in datetime_cols if _is_start_column(col)]
+        max_cols = [col for col in datetime_cols if col not in start_cols]
+        if start_cols:
+            results.update(grouped[start_cols].min().reindex(part_index).items())
+        if max_cols:
+            results.update(grouped[max_cols].max().reindex(part_index).items())
+
+    # 4) durations → sum
+    if timedelta_cols:
+        results.update(grouped[timedelta_cols].sum(min_count=1).reindex(part_index).items())
+
+    # 5) categoricals/objects/strings → unique values in order of appearance, comma joined
+    if text_cols:
+        text = joined[text_cols].astype(object)
+        text["__part"] = part_idx
+        text = text.melt(id_vars="__part", var_name="__column", value_name="__value")
+        text = text[text["__value"].notna()]
+        text["__value"] = text["__value"].astype(str)
+        text = text.drop_duplicates()
+        joined_text = (
+            text.groupby(["__part", "__column"], sort=True)["__value"]
+            .agg(", ".join)
+            .unstack("__column")
+        )
+        for col in text_cols:
+            values = joined_text[col] if col in joined_text.columns else pd.Series(dtype=object)
+            # let pandas infer the string dtype, as it does when building from row dicts
+            results[col] = values.reindex(part_index).astype(object).where(lambda s: s.notna(), None).infer_objects()
+
+    for col in attributes.columns:
+        aggregated[col] = results[col]
+
+    return aggregated
+
+def apply_union(
+        input_gdf: gpd.GeoDataFrame,
+        workers: Optional[int] = None,
+        partition_size: Optional[int] = None,
+        coverage: Optional[bool] = None
+    ) -> gpd.GeoDataFrame:
+    """
+    Union overlapping polygons, preserving non-overlapping polygons,
+    and aggregate attributes sensibly by dtype.
+
+    Inputs larger than `partition_size` (UNION_PARTITION_SIZE) are unioned
+    with the tiled engine on `workers` (UNION_WORKERS) threads; smaller ones
+    in a single GEOS call.
+
+    `coverage=True` declares the input a valid polygon coverage (adjacent,
+    non-overlapping polygons such as parcels) and dissolves it with the much
+    faster coverage union; the hint is trusted, not checked. With no hint the
+    input is checked when UNION_DETECT_COVERAGE is enabled.
+    """
+    if workers is None:
+        workers = app_config.UNION_WORKERS
+    if partition_size is None:
+        partition_size = app_config.UNION_PARTITION_SIZE
+
+    # 0) Guard: polygonal only
+    if not _all_polygonal(input_gdf.geometry):
+        raise ValueError("All geometries must be polygons or multipolygons to apply union.")
+
+    if coverage is None and app_config.UNION_DETECT_COVERAGE:
+        coverage = bool(shapely.coverage_is_valid(np.asarray(input_gdf.geometry.values)))
+        logger.info(f"Union input is {'a' if coverage else 'not a'} valid polygon coverage")
+
+    # 1) Build the unioned geometry and extract individual polygons
+    if coverage:
+        parts = _coverage_union_parts(input_gdf.geometry)
+    elif len(input_gdf) > partition_size:
+        logger.info(f"Tiled union of {len(input_gdf)} geometries in partitions of {partition_size} on {workers} worker(s)")
+        parts = _tiled_union_parts(input_gdf.geometry, workers, partition_size)
+    else:
+        parts = _union_parts(input_gdf.geometry)
+
+    return _unioned_frame(input_gdf, input_gdf.geometry, parts)
+
+def _unioned_frame(input_gdf: gpd.GeoDataFrame, geometry: gpd.GeoSeries, parts: np.ndarray) -> gpd.GeoDataFrame:
+    """
+    Build the union output: one row per polygon in `parts`, carrying the
+    aggregated attributes of the `input_gdf` rows whose `geometry` intersects
+    it, with the columns in the input order.
+    """
+    # 2) Aggregate the attributes of the inputs behind each output polygon
+    geometry_col = input_gdf.geometry.name
+    attributes = input_gdf.drop(columns=geometry_col)
+    aggregated = _aggregate_attributes(attributes, geometry, parts)
+
+    # 3) Build GeoDataFrame; ensure the same columns order as input
+    aggregated[geometry_col] = gpd.GeoSeries(parts, crs=geometry.crs)
+    unioned_gdf = gpd.GeoDataFrame(aggregated, geometry=geometry_col, crs=geometry.crs)
     unioned_gdf = unioned_gdf[input_gdf.columns]
 
     return unioned_gdf
+
+def apply_buffer_union(
+        input_gdf: gpd.GeoDataFrame,
+        distance: float,
+        units: str,
+        simplify_tolerance: Optional[float] = None,
+        workers: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ) -> gpd.GeoDataFrame:
+    """
+    Fused "buffer then union": the same dissolved result as apply_buffer
+    followed by apply_union, without materializing the buffered GeoDataFrame.
+
+    The buffered geometries are unioned with the tiled engine in Hilbert-sorted
+    batches of `batch_size` (BUFFER_UNION_BATCH_SIZE) on `workers`
+    (UNION_WORKERS) threads; small batches of buffers, which overlap mostly
+    with their neighbours, union much faster than one large overlay.
+    """
+    if workers is None:
+        workers = app_config.UNION_WORKERS
+    if batch_size is None:
+        batch_size = app_config.BUFFER_UNION_BATCH_SIZE
+
+    buffered = buffer_geometry(input_gdf, distance, units, simplify_tolerance)
+
+    if not _all_polygonal(buffered):
+        raise ValueError("All geometries must be polygons or multipolygons to apply union.")
+
+    parts = _tiled_union_parts(buffered, workers, batch_size)
+    return _unioned_frame(input_gdf, buffered, parts)
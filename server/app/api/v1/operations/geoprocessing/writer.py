@@ -1,56 +1,127 @@
+import io
 import os
+import gzip
 import zipfile
 import glob
-import json
+import tempfile
+import datetime
 import ezdxf
-from shapely.geometry import Point, LineString, Polygon, MultiPolygon
-from shapely.validation import make_valid
+import orjson
+import zstandard
+import numpy as np
+import pandas as pd
+import shapely
 import geopandas as gpd
+from typing import Optional
+from app.api.v1.operations.geoprocessing.crs import reproject
 from app.core.config import config as app_config
 
+try:
+    # private to ezdxf, only used for the fast LWPOLYLINE path in _add_lwpolyline
+    from ezdxf.entities.lwpolyline import LWPolylinePoints
+    if LWPolylinePoints.VERTEX_SIZE != 5:
+        LWPolylinePoints = None
+except (ImportError, AttributeError):
+    LWPolylinePoints = None
+
+SHP_ZIP_COMPRESSION = {
+    "deflated": zipfile.ZIP_DEFLATED,
+    "stored": zipfile.ZIP_STORED,
+}
 
 def gdf_to_shp(gdf: gpd.GeoDataFrame, output_dir: str, output_epsg: int) -> str:
     """
     Reproject and save a GeoDataFrame to a shapefile and zip all related files.
+
+    The parts are written to a scratch directory (SHP_SCRATCH_DIR, the system
+    temp dir by default; point it at a tmpfs to keep them off disk), then each
+    one is streamed into the archive and deleted, so only the zip is written to
+    `output_dir`. Compression follows SHP_ZIP_COMPRESSION ("deflated" or
+    "stored") and SHP_ZIP_COMPRESSLEVEL.
     """
     output_file_name = f"geoflip_shp_{output_epsg}"
-    output_path = os.path.join(output_dir, f"{output_file_name}.shp")
 
     # Reproject if needed
     if gdf.crs is None:
         raise ValueError("Input GeoDataFrame has no CRS defined.")
 
-    if gdf.crs.to_epsg() != output_epsg:
-        gdf = gdf.to_crs(epsg=output_epsg)
+    gdf = reproject(gdf, output_epsg)
 
-    # Save to .shp
-    gdf.to_file(output_path, driver="ESRI Shapefile")
-
-    # Now zip all related files (.shp, .shx, .dbf, .prj, etc.)
-    base_name = os.path.splitext(output_path)[0]  # remove .shp
-    shapefile_parts = glob.glob(f"{base_name}.*")
+    compression = SHP_ZIP_COMPRESSION[app_config.SHP_ZIP_COMPRESSION]
+    compresslevel = app_config.SHP_ZIP_COMPRESSLEVEL if compression == zipfile.ZIP_DEFLATED else None
 
     zip_output_path = os.path.join(output_dir, f"{output_file_name}.zip")
-    with zipfile.ZipFile(zip_output_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-        for filepath in shapefile_parts:
-            arcname = os.path.basename(filepath)  # filename inside zip
-            zipf.write(filepath, arcname=arcname)
+    with tempfile.TemporaryDirectory(dir=app_config.SHP_SCRATCH_DIR) as scratch_dir:
+        # Save to .shp
+        gdf.to_file(os.path.join(scratch_dir, f"{output_file_name}.shp"), driver="ESRI Shapefile")
+
+        # Now zip all related files (.shp, .shx, .dbf, .prj, etc.)
+        with zipfile.ZipFile(zip_output_path, "w", compression, compresslevel=compresslevel) as zipf:
+            for filepath in sorted(glob.glob(os.path.join(scratch_dir, f"{output_file_name}.*"))):
+                arcname = os.path.basename(filepath)  # filename inside zip
+                zipf.write(filepath, arcname=arcname)
+                os.remove(filepath)
 
     return zip_output_path
 
-def gdf_to_geojson_data(gdf: gpd.GeoDataFrame) -> str:
+def gdf_to_fgb(gdf: gpd.GeoDataFrame, output_dir: str, output_epsg: int) -> str:
+    """
+    Reproject and save a GeoDataFrame as a single FlatGeobuf file with a
+    packed Hilbert R-tree spatial index, so consumers can fetch only the
+    features inside a bbox.
+    """
+    if gdf.crs is None:
+        raise ValueError("Input GeoDataFrame has no CRS defined.")
+
+    gdf = reproject(gdf, output_epsg)
+
+    output_file_name = f"geoflip_fgb_{output_epsg}"
+    output_path = os.path.join(output_dir, f"{output_file_name}.fgb")
+
+    gdf.to_file(output_path, driver="FlatGeobuf", SPATIAL_INDEX="YES")
+
+    return output_path
+
+def _json_default(value):
+	"""
+	orjson fallback for the property values it does not encode natively.
+	"""
+	if value is pd.NA or value is pd.NaT:
+		return None
+	if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+		return value.isoformat()
+	if isinstance(value, np.generic):
+		return value.item()
+	if isinstance(value, bytes):
+		return value.hex()
+	return str(value)
+
+def gdf_to_geojson_data(gdf: gpd.GeoDataFrame) -> bytes:
 	"""
-	Convert a GeoDataFrame to GeoJSON dict format.
+	Encode a GeoDataFrame as a compact GeoJSON FeatureCollection, in a single
+	pass to UTF-8 bytes. Geometries are encoded vectorized by GEOS and the
+	properties of each feature by orjson; the layout matches ``to_json()``.
 	"""
     # Reproject if needed
 	if gdf.crs is None:
 		raise ValueError("Input GeoDataFrame has no CRS defined.")
 
-	if gdf.crs.to_epsg() != 4326:
-		gdf = gdf.to_crs(epsg=4326)
+	gdf = reproject(gdf, 4326)
 
-	geojson_dict = json.loads(gdf.to_json())
-	return geojson_dict
+	values = np.asarray(gdf.geometry.values)
+	geometries = shapely.to_geojson(values)
+	# to_json() writes empty geometries (e.g. from negative buffers) as null
+	geometries[shapely.is_empty(values)] = None
+	records = gdf.drop(columns=gdf.geometry.name).to_dict("records")
+
+	features = [
+		b'{"id":' + orjson.dumps(str(feature_id))
+		+ b',"type":"Feature","properties":' + orjson.dumps(properties, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+		+ b',"geometry":' + (geometry.encode("utf-8") if geometry is not None else b"null")
+		+ b"}"
+		for feature_id, properties, geometry in zip(gdf.index, records, geometries)
+	]
+	return b'{"type":"FeatureCollection","features":[' + b",".join(features) + b"]}"
 
 def gdf_to_geojson_file(gdf: gpd.GeoDataFrame, output_dir: str) -> str:
     """
@@ -74,8 +145,7 @@ def gdf_to_geojson_file(gdf: gpd.GeoDataFrame, output_dir: str) -> str:
         raise ValueError("Input GeoDataFrame has no CRS defined.")
 
     # Always write GeoJSON in WGS-84
-    if gdf.crs.to_epsg() != 4326:
-        gdf = gdf.to_crs(epsg=4326)
+    gdf = reproject(gdf, 4326)
 
     # File name & path
     output_file_name = "geoflip_geojson_4326"
@@ -92,37 +162,90 @@ def gdf_to_geojson_file(gdf: gpd.GeoDataFrame, output_dir: str) -> str:
     return output_path
 
 
-def _xy_coords(seq):
-    # Flatten (x,y[,z]) to (x,y)
-    return [(float(x), float(y)) for x, y, *_ in seq]
+GEOMETRY_COLLECTION_TYPES = [
+    shapely.GeometryType.MULTIPOINT,
+    shapely.GeometryType.MULTILINESTRING,
+    shapely.GeometryType.MULTIPOLYGON,
+    shapely.GeometryType.GEOMETRYCOLLECTION,
+]
+
+def _repair_polygons(values: np.ndarray) -> np.ndarray:
+    """
+    make_valid every invalid (multi)polygon in one call. The polygonal parts of
+    the repaired geometries replace them, appended after the valid ones.
+    """
+    type_ids = shapely.get_type_id(values)
+    polygonal = np.isin(type_ids, [shapely.GeometryType.POLYGON, shapely.GeometryType.MULTIPOLYGON])
+    invalid = polygonal & ~shapely.is_valid(values)
+    if not invalid.any():
+        return values
+
+    repaired = _explode(shapely.make_valid(values[invalid]))
+    repaired = repaired[shapely.get_type_id(repaired) == shapely.GeometryType.POLYGON]
+    return np.concatenate([values[~invalid], repaired])
 
-def _safe_polygon(poly: Polygon) -> Polygon:
-    # Ensure ring validity & correct orientation if needed
-    if not poly.is_valid:
-        poly = make_valid(poly)
-        # make_valid can return MultiPolygon; pick an approach
-        if isinstance(poly, MultiPolygon):
-            # merge by taking largest area part; adjust to your needs
-            poly = max(poly.geoms, key=lambda p: p.area)
-    return poly
+def _explode(values: np.ndarray) -> np.ndarray:
+    """
+    Break Multi* geometries and collections (nested too) into single parts.
+    """
+    while np.isin(shapely.get_type_id(values), GEOMETRY_COLLECTION_TYPES).any():
+        values = shapely.get_parts(values)
+    return values[~shapely.is_empty(values)]
 
-def _write_polygon(msp, poly: Polygon):
-    if poly.is_empty:
+def _split_coordinates(geometries: np.ndarray) -> list:
+    """
+    2D coordinates of each geometry as an (n, 2) array, extracted in bulk.
+    """
+    if len(geometries) == 0:
+        return []
+    coordinates = shapely.get_coordinates(geometries)
+    offsets = np.cumsum(shapely.get_num_coordinates(geometries))[:-1]
+    return np.split(coordinates, offsets)
+
+def _add_lwpolyline(msp, xy: np.ndarray, close: bool) -> None:
+    if LWPolylinePoints is None:
+        msp.add_lwpolyline(xy.tolist(), format="xy", close=close)
         return
 
-    # 1) Boundary as closed LWPOLYLINE (outer + holes)
-    exterior_xy = _xy_coords(list(poly.exterior.coords))
-    msp.add_lwpolyline(exterior_xy, close=True)
-    for interior in poly.interiors:
-        msp.add_lwpolyline(_xy_coords(list(interior.coords)), close=True)
+    # load the vertices as one (x, y, start width, end width, bulge) array
+    # instead of letting ezdxf compile them point by point
+    polyline = msp.add_lwpolyline([], close=close)
+    vertices = np.zeros((len(xy), LWPolylinePoints.VERTEX_SIZE))
+    vertices[:, :2] = xy
+    polyline.lwpoints = LWPolylinePoints(vertices.tolist())
 
-    # 2) SOLID HATCH with holes
-    hatch = msp.add_hatch()  # defaults to SOLID
-    # Exterior path
-    hatch.paths.add_polyline_path(exterior_xy, is_closed=True)
-    # Hole paths
-    for interior in poly.interiors:
-        hatch.paths.add_polyline_path(_xy_coords(list(interior.coords)), is_closed=True)
+def _write_dxf_entities(msp, values: np.ndarray) -> None:
+    """
+    Add the entities for an array of geometries to a DXF modelspace:
+    - Points -> POINT
+    - LineStrings -> LWPOLYLINE (closed for LinearRings)
+    - Polygons -> closed LWPOLYLINE per ring + SOLID HATCH (with holes)
+    Multi* geometries and collections are written part by part.
+    """
+    parts = _explode(_repair_polygons(values))
+    type_ids = shapely.get_type_id(parts)
+
+    points = parts[type_ids == shapely.GeometryType.POINT]
+    for x, y in shapely.get_coordinates(points).tolist():
+        msp.add_point((x, y))
+
+    for type_id, close in ((shapely.GeometryType.LINESTRING, False), (shapely.GeometryType.LINEARRING, True)):
+        for line_xy in _split_coordinates(parts[type_ids == type_id]):
+            _add_lwpolyline(msp, line_xy, close)
+
+    polygons = parts[type_ids == shapely.GeometryType.POLYGON]
+    rings, ring_polygon = shapely.get_rings(polygons, return_index=True)
+    ring_xy = _split_coordinates(rings)
+    ring_offsets = np.searchsorted(ring_polygon, np.arange(len(polygons) + 1)).tolist()
+    for start, end in zip(ring_offsets[:-1], ring_offsets[1:]):
+        # 1) Boundary as closed LWPOLYLINE (outer + holes)
+        for xy in ring_xy[start:end]:
+            _add_lwpolyline(msp, xy, True)
+
+        # 2) SOLID HATCH with holes
+        hatch = msp.add_hatch()  # defaults to SOLID
+        for xy in ring_xy[start:end]:
+            hatch.paths.add_polyline_path(xy.tolist(), is_closed=True)
 
 def gdf_to_dxf(gdf: gpd.GeoDataFrame, output_dir: str, output_epsg: int) -> str:
     """
@@ -130,13 +253,13 @@ def gdf_to_dxf(gdf: gpd.GeoDataFrame, output_dir: str, output_epsg: int) -> str:
     - Points -> POINT
     - LineStrings -> LWPOLYLINE
     - Polygons -> closed LWPOLYLINE + SOLID HATCH (with holes)
-    - MultiPolygons -> each part as above
+    - Multi* and GeometryCollections -> each part as above
+    Invalid polygons are repaired with make_valid first.
     """
     if gdf.crs is None:
         raise ValueError("Input GeoDataFrame has no CRS defined.")
 
-    if gdf.crs.to_epsg() != output_epsg:
-        gdf = gdf.to_crs(epsg=output_epsg)
+    gdf = reproject(gdf, output_epsg)
 
     output_file_name = f"geoflip_dxf_{output_epsg}"
     output_path = os.path.join(output_dir, f"{output_file_name}.dxf")
@@ -144,35 +267,47 @@ def gdf_to_dxf(gdf: gpd.GeoDataFrame, output_dir: str, output_epsg: int) -> str:
     doc = ezdxf.new(dxfversion="R2018")
     msp = doc.modelspace()
 
-    for geom in gdf.geometry:
-        if geom is None or geom.is_empty:
-            continue
-
-        # Handle multipart polygons
-        if isinstance(geom, MultiPolygon):
-            for part in geom.geoms:
-                _write_polygon(msp, _safe_polygon(part))
-            continue
-
-        # Singles
-        if isinstance(geom, Point):
-            msp.add_point((geom.x, geom.y))
-        elif isinstance(geom, LineString):
-            msp.add_lwpolyline(_xy_coords(geom.coords))
-        elif isinstance(geom, Polygon):
-            _write_polygon(msp, _safe_polygon(geom))
-        else:
-            # You may add MultiLineString, GeometryCollection handlers here
-            print(f"Skipping unsupported geometry type: {geom.geom_type}")
+    values = np.asarray(gdf.geometry.values)
+    values = values[~(shapely.is_missing(values) | shapely.is_empty(values))]
+    _write_dxf_entities(msp, values)
 
     doc.saveas(output_path)
     return output_path
 
 
-def gdf_to_csv(gdf: gpd.GeoDataFrame, output_dir: str, output_epsg: int) -> str:
+CSV_COMPRESSION_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+CSV_GZIP_LEVEL = 6
+CSV_ZSTD_LEVEL = 3
+
+def _open_csv_output(path: str, compression: Optional[str] = None):
+    """
+    Text handle writing to `path`, gzip- or zstd-compressed on the fly.
+    """
+    match compression:
+        case None:
+            return open(path, "w", encoding="utf-8", newline="")
+        case "gzip":
+            return gzip.open(path, "wt", compresslevel=CSV_GZIP_LEVEL, encoding="utf-8", newline="")
+        case "zstd":
+            writer = zstandard.ZstdCompressor(level=CSV_ZSTD_LEVEL).stream_writer(open(path, "wb"))
+            return io.TextIOWrapper(writer, encoding="utf-8", newline="")
+        case _:
+            raise ValueError(f"Unsupported CSV compression: {compression}")
+
+def gdf_to_csv(
+        gdf: gpd.GeoDataFrame,
+        output_dir: str,
+        output_epsg: int,
+        csv_geometry: str = "wkt",
+        compression: Optional[str] = None,
+        chunk_size: Optional[int] = None
+    ) -> str:
     """
     Reproject and save a GeoDataFrame to CSV with geometry in WKT format.
 
+    The frame is written CSV_CHUNK_SIZE rows at a time, converting only that
+    chunk's geometry, so the full text geometry column is never held in memory.
+
     Parameters
     ----------
     gdf : geopandas.GeoDataFrame
@@ -181,6 +316,13 @@ def gdf_to_csv(gdf: gpd.GeoDataFrame, output_dir: str, output_epsg: int) -> str:
         Directory where the CSV file will be written.
     output_epsg : int
         EPSG code for the output CRS.
+    csv_geometry : str
+        "wkt" for a geom_wkt column, or "wkb_hex" for a geom_wkb column of
+        hex-encoded WKB.
+    compression : str, optional
+        "gzip" or "zstd" to compress the file as it is written.
+    chunk_size : int, optional
+        Rows per chunk, CSV_CHUNK_SIZE by default.
 
     Returns
     -------
@@ -191,25 +333,102 @@ def gdf_to_csv(gdf: gpd.GeoDataFrame, output_dir: str, output_epsg: int) -> str:
         raise ValueError("Input GeoDataFrame has no CRS defined.")
 
     # Reproject if needed
-    if gdf.crs.to_epsg() != output_epsg:
-        gdf = gdf.to_crs(epsg=output_epsg)
-
-    # Convert geometry to WKT and drop geometry column
-    gdf = gdf.copy()
-    gdf["geom_wkt"] = gdf.geometry.to_wkt()
-    gdf = gdf.drop(columns="geometry")
+    gdf = reproject(gdf, output_epsg)
+
+    match csv_geometry:
+        case "wkt":
+            geometry_column = "geom_wkt"
+            to_text = shapely.to_wkt
+        case "wkb_hex":
+            geometry_column = "geom_wkb"
+            to_text = lambda values: shapely.to_wkb(values, hex=True)
+        case _:
+            raise ValueError(f"Unsupported CSV geometry encoding: {csv_geometry}")
+
+    chunk_size = chunk_size or app_config.CSV_CHUNK_SIZE
+    geometry_name = gdf.geometry.name
+    attribute_columns = [column for column in gdf.columns if column != geometry_name]
+    geometry = np.asarray(gdf.geometry.values)
 
     # File name & path
     output_file_name = f"geoflip_csv_{output_epsg}"
-    output_path = os.path.join(output_dir, f"{output_file_name}.csv")
+    extension = CSV_COMPRESSION_EXTENSIONS.get(compression, "")
+    output_path = os.path.join(output_dir, f"{output_file_name}.csv{extension}")
+
+    # Write CSV chunk by chunk; the header goes out with the first one
+    with _open_csv_output(output_path, compression) as f:
+        for start in range(0, max(len(gdf), 1), chunk_size):
+            chunk = pd.DataFrame(gdf.iloc[start:start + chunk_size][attribute_columns])
+            chunk[geometry_column] = to_text(geometry[start:start + chunk_size])
+            chunk.to_csv(f, index=False, header=start == 0)
+
+    return output_path
+
+def gdf_to_parquet(gdf: gpd.GeoDataFrame, output_dir: str, output_epsg: int) -> str:
+    """
+    Reproject and save a GeoDataFrame as GeoParquet.
+
+    A bbox covering column is written so readers (including Geoflip) can
+    skip row groups outside a bbox filter.
+    """
+    if gdf.crs is None:
+        raise ValueError("Input GeoDataFrame has no CRS defined.")
+
+    gdf = reproject(gdf, output_epsg)
+
+    output_file_name = f"geoflip_parquet_{output_epsg}"
+    output_path = os.path.join(output_dir, f"{output_file_name}.parquet")
 
-    # Write CSV
-    gdf.to_csv(output_path, index=False)
+    gdf.to_parquet(output_path, index=False, write_covering_bbox=True)
+
+    return output_path
+
+def gdf_to_feather(gdf: gpd.GeoDataFrame, output_dir: str, output_epsg: int) -> str:
+    """
+    Reproject and save a GeoDataFrame as a Feather (Arrow IPC) file.
+    """
+    if gdf.crs is None:
+        raise ValueError("Input GeoDataFrame has no CRS defined.")
+
+    gdf = reproject(gdf, output_epsg)
+
+    output_file_name = f"geoflip_feather_{output_epsg}"
+    output_path = os.path.join(output_dir, f"{output_file_name}.feather")
+
+    gdf.reset_index(drop=True).to_feather(output_path)
+
+    return output_path
+
+def output_crs_epsg(output_format: str, output_epsg: int) -> int:
+    """
+    EPSG code the output is actually written in; GeoJSON is always EPSG:4326.
+    """
+    return 4326 if output_format == "geojson" else output_epsg
+
+INLINE_RESULT_GZIP_LEVEL = 5
+
+def write_inline_result(data: bytes, job_id: str, compression: Optional[str] = None) -> str:
+    """
+    Store an inline (GeoJSON) result in the job's output directory instead of
+    the result backend, gzip compressed when `compression` is "gzip".
+    """
+    output_dir = os.path.join(app_config.DATA_PATH, job_id, "output")
+    os.makedirs(output_dir, exist_ok=True)
+
+    if compression == "gzip":
+        output_path = os.path.join(output_dir, "geoflip_inline_result.json.gz")
+        with gzip.open(output_path, "wb", compresslevel=INLINE_RESULT_GZIP_LEVEL) as f:
+            f.write(data)
+    else:
+        output_path = os.path.join(output_dir, "geoflip_inline_result.json")
+        with open(output_path, "wb") as f:
+            f.write(data)
 
     return output_path
 
 # returns the path to the output file or the content of the file
-def gdf_to_output(gdf: gpd.GeoDataFrame, output_format:str, output_epsg:int, job_id:str, to_file:bool = True) -> str:
+def gdf_to_output(gdf: gpd.GeoDataFrame, output_format:str, output_epsg:int, job_id:str, to_file:bool = True, output_options: Optional[dict] = None) -> str:
+	output_options = output_options or {}
 	output_dir = os.path.join(app_config.DATA_PATH, job_id, "output")
 	os.makedirs(output_dir, exist_ok=True)
 	
@@ -229,7 +448,16 @@ def gdf_to_output(gdf: gpd.GeoDataFrame, output_format:str, output_epsg:int, job
 			output_dxf_path = gdf_to_dxf(gdf, output_dir, output_epsg)
 			return ("filepath", output_dxf_path)
 		case "csv":
-			output_csv_path = gdf_to_csv(gdf, output_dir, output_epsg)
+			output_csv_path = gdf_to_csv(gdf, output_dir, output_epsg, **output_options)
 			return ("filepath", output_csv_path)
+		case "fgb":
+			output_fgb_path = gdf_to_fgb(gdf, output_dir, output_epsg)
+			return ("filepath", output_fgb_path)
+		case "parquet":
+			output_parquet_path = gdf_to_parquet(gdf, output_dir, output_epsg)
+			return ("filepath", output_parquet_path)
+		case "feather":
+			output_feather_path = gdf_to_feather(gdf, output_dir, output_epsg)
+			return ("filepath", output_feather_path)
 		case _:
 			raise ValueError(f"Unsupported output format: {output_format}")
\ No newline at end of file
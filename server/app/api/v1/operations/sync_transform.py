@@ -0,0 +1,29 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+from app.api.v1.operations.transform import run_transform
+from app.core.config import config as app_config
+
+logger = logging.getLogger("api")
+
+# bounded pool for small jobs run inside the API process instead of the queue
+_executor = ThreadPoolExecutor(max_workers=app_config.SYNC_WORKERS, thread_name_prefix="sync-transform")
+_slots = threading.BoundedSemaphore(app_config.SYNC_WORKERS)
+
+async def try_run_sync(**job) -> Optional[dict]:
+    """
+    Run `run_transform(**job)` on the API's bounded pool without blocking the
+    event loop. Returns None straight away when every slot is busy, so the
+    caller can queue the job on Celery instead.
+    """
+    if not _slots.acquire(blocking=False):
+        return None
+
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, partial(run_transform, **job))
+    finally:
+        _slots.release()
@@ -1,17 +1,151 @@
 # app/routers/tasks.py
 import logging
 import datetime
-from typing import Optional 
+from typing import Callable, Optional
 from celery import shared_task
-from app.api.v1.operations.geoprocessing.writer import gdf_to_output
+from app.api.v1.operations.geoprocessing.writer import gdf_to_output, output_crs_epsg, write_inline_result
+from app.core.config import config as app_config
 
 import geopandas as gpd
 
 from app.api.v1.operations.geoprocessing.reader import input_to_gdf
-from app.api.v1.operations.geoprocessing.transformation_manager import apply_transformations
+from app.api.v1.operations.geoprocessing.transformation_manager import apply_transformations, crs_policy
+from app.api.v1.operations.geoprocessing.stage_cache import file_digest, stage_key, load_longest_prefix, save_stage
 
 logger = logging.getLogger("api") # Use a logger specific to tasks if desired
 
+def run_transform(
+        job_id: str,
+        input_format: str,
+        transformations: list,
+        output_format: str,
+        output_epsg: int,
+        input_epsg: Optional[int] = None,
+        input_file_path: str = None,
+        to_file: bool = True,
+        input_options: Optional[dict] = None,
+        progress: Optional[Callable[[str], None]] = None,
+        max_inline_bytes: Optional[int] = None,
+        output_options: Optional[dict] = None,
+        input_digest: Optional[str] = None
+    ) -> dict:
+    """
+    Read, transform and write one job, returning the result message stored for
+    it. Shared by the Celery task and the synchronous in-API path; `progress`
+    receives a short message as each step starts.
+
+    Inline results larger than `max_inline_bytes` are written to the job
+    directory and only referenced from the result message. `output_options`
+    are passed on to the writer (e.g. CSV geometry encoding and compression).
+    `input_digest` is the sha256 of the input computed on upload; the file is
+    only hashed again when it is missing.
+    """
+    input_gdf: gpd.GeoDataFrame = None
+    if progress is None:
+        progress = lambda message: None
+
+    start_time = datetime.datetime.now()
+
+    if not input_file_path:
+        raise ValueError("Either input_file_path or data must be provided - not both.")
+
+    # Resume from the longest cached prefix of the pipeline
+    use_cache = app_config.STAGE_CACHE_ENABLED
+    completed = 0
+    if use_cache:
+        input_digest = input_digest or file_digest(input_file_path)
+        cache_options = {"format": input_format, "epsg": input_epsg, **(input_options or {})}
+        policy = crs_policy(transformations)
+        stage_keys = [
+            stage_key(input_digest, cache_options, transformations[:n], policy)
+            for n in range(len(transformations) + 1)
+        ]
+        completed, input_gdf = load_longest_prefix(stage_keys)
+        if input_gdf is not None:
+            logger.info(f"Job {job_id}: Resuming from cached stage {completed}/{len(transformations)}")
+
+    # Read input data
+    progress("Reading data")
+    if input_gdf is None:
+        completed = 0
+        read_start = datetime.datetime.now()
+        input_gdf = input_to_gdf(input_format, input_file_path, input_epsg, **(input_options or {}))
+        read_elapsed = (datetime.datetime.now() - read_start).total_seconds()
+        logger.info(
+            f"Job {job_id}: Data read successfully in {read_elapsed}s "
+            f"(arrow={app_config.READER_USE_ARROW}) {input_gdf.head()}"
+        )
+        if use_cache:
+            save_stage(stage_keys[0], input_gdf)
+
+    def cache_stage(done: int, gdf: gpd.GeoDataFrame) -> None:
+        if use_cache:
+            save_stage(stage_keys[completed + done], gdf)
+
+    # Apply the transformations not covered by the cache
+    progress("Applying transformations")
+    input_gdf, transformations_applied, plan = apply_transformations(
+        gdf=input_gdf,
+        transformations=transformations[completed:],
+        output_epsg=output_crs_epsg(output_format, output_epsg),
+        on_stage=cache_stage
+    )
+    transformations_applied = [t["type"] for t in transformations[:completed]] + transformations_applied
+    plan["resumed_from_stage"] = completed
+    logger.info(f"Job {job_id}: Transformations applied: {transformations_applied}")
+
+    # write to desired output format
+    progress("Writing output")
+    if input_gdf is not None:
+        output_type, output = gdf_to_output(input_gdf, output_format, output_epsg, job_id, to_file, output_options)
+    else:
+        logger.warning(f"Job {job_id}: input_gdf is None, no data to write.")
+        raise ValueError("No data to write.")
+
+    end_time = datetime.datetime.now()
+    elapsed = (end_time - start_time).total_seconds()
+
+    if output_type == "filepath":
+        result_msg = {
+            "message": "Data transformed successfully",
+            "output_type": output_type,
+            "output_filepath": output,
+            "output_data": None,
+            "processing_time_seconds": elapsed,
+            "plan": plan
+        }
+    elif output_type == "data" and max_inline_bytes is not None and len(output) > max_inline_bytes:
+        compression = "gzip" if app_config.INLINE_RESULT_COMPRESS else None
+        output_data_path = write_inline_result(output, job_id, compression)
+        logger.info(f"Job {job_id}: Inline result of {len(output)} bytes stored at {output_data_path}")
+        result_msg = {
+            "message": "Data transformed successfully",
+            "output_type": output_type,
+            "output_filepath": None,
+            "output_data": None,
+            # too large for the result backend: streamed from disk by the API
+            "output_data_path": output_data_path,
+            "output_data_encoding": compression,
+            "output_size_bytes": len(output),
+            "processing_time_seconds": elapsed,
+            "plan": plan
+        }
+    elif output_type == "data":
+        result_msg = {
+            "message": "Data transformed successfully",
+            "output_type": output_type,
+            "output_filepath": None,
+            # GeoJSON text, returned verbatim by the API
+            "output_data": output.decode("utf-8"),
+            "output_size_bytes": len(output),
+            "processing_time_seconds": elapsed,
+            "plan": plan
+        }
+    else:
+        raise ValueError(f"invalid output_type was returned: {output_type}")
+
+    return result_msg
+
 @shared_task(bind=True, name="app.routers.tasks.transform_task")
 def transform_operation(self, 
         job_id: str,
@@ -21,60 +155,31 @@ def transform_operation(self,
         output_epsg:int,
         input_epsg: Optional[int] = None, 
         input_file_path: str = None, 
-        to_file: bool = True
+        to_file: bool = True,
+        input_options: Optional[dict] = None,
+        output_options: Optional[dict] = None,
+        input_digest: Optional[str] = None
     ) -> dict:
-    input_gdf: gpd.GeoDataFrame = None
-
     logger.info(f"Task {self.request.id}: Starting transform_task")
 
     try:
-        start_time = datetime.datetime.now()
         self.update_state(state="STARTED", meta={"message": "Transform task started"})
+        result_msg = run_transform(
+            job_id,
+            input_format,
+            transformations,
+            output_format,
+            output_epsg,
+            input_epsg,
+            input_file_path,
+            to_file,
+            input_options,
+            progress=lambda message: self.update_state(state="PROCESSING", meta={"message": message}),
+            max_inline_bytes=app_config.INLINE_RESULT_MAX_BYTES,
+            output_options=output_options,
+            input_digest=input_digest
+        )
 
-        # Read input data
-        self.update_state(state="PROCESSING", meta={"message": "Reading data"})
-        if (input_file_path):
-            input_gdf = input_to_gdf(input_format, input_file_path, input_epsg)
-            logger.info(f"Task {self.request.id}: Data read successfully {input_gdf.head()}")
-        else:
-            raise ValueError("Either input_file_path or data must be provided - not both.")
-
-        # Apply transformations
-        self.update_state(state="PROCESSING", meta={"message": "Applying transformations"})
-        input_gdf, transformations_applied = apply_transformations(gdf=input_gdf, transformations=transformations)
-        logger.info(f"Task {self.request.id}: Transformations applied: {transformations_applied}")
-
-        # write to desired output format
-        self.update_state(state="PROCESSING", meta={"message": "Writing output"})
-        if input_gdf is not None:
-            output_type, output = gdf_to_output(input_gdf, output_format, output_epsg, job_id, to_file)
-        else:
-            logger.warning(f"Task {self.request.id}: input_gdf is None, no data to write.")
-            raise ValueError("No data to write.")
-
-        end_time = datetime.datetime.now()
-        elapsed = (end_time - start_time).total_seconds()
-
-        if output_type == "filepath":
-            result_msg = {
-                "message": "Data transformed successfully",
-                "output_type": output_type,
-                "output_filepath": output,
-                "output_data": None,
-                "processing_time_seconds": elapsed
-            }
-        elif output_type == "data":
-            result_msg = {
-                "message": "Data transformed successfully",
-                "output_type": output_type,
-                "output_filepath": None,
-                "output_data": output,
-                "processing_time_seconds": elapsed
-            }
-        else:
-            raise ValueError(f"invalid output_type was returned: {output_type}")
-        
-        
         logger.info(f"Task {self.request.id}: Finished transform_task successfully")
         return result_msg
 
@@ -1,13 +1,13 @@
 import logging
 import os
-import json
+import gzip
 import datetime
 from enum import Enum
 from pydantic import BaseModel, UUID4, HttpUrl, ConfigDict
-from typing import Annotated, Optional
-from fastapi.responses import FileResponse
+from typing import Annotated, List, Optional
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi import APIRouter, Request, Depends, HTTPException
-from celery.result import AsyncResult
+from celery.result import AsyncResult, GroupResult
 
 from app.core.celery_worker import celery_app
 from app.core.config import config
@@ -24,12 +24,14 @@ class TaskStatus(str, Enum):
     FAILURE = "FAILURE"
     SUCCESS = "SUCCESS"
     PROCESSING = "PROCESSING"
+    REVOKED = "REVOKED"     # set by Celery for jobs that expired before a worker ran them
 
 class TaskStatusOut(BaseModel):
     job_id: UUID4
     status: TaskStatus
     message: Optional[str] = None
     output_url: Optional[HttpUrl] = None
+    plan: Optional[dict] = None
 
     model_config = ConfigDict(
         json_schema_extra={
@@ -41,9 +43,86 @@ class TaskStatusOut(BaseModel):
         }
     )
 
+class BatchStatusOut(BaseModel):
+    batch_id: UUID4
+    status: TaskStatus
+    total: int
+    succeeded: int
+    failed: int
+    jobs: List[TaskStatusOut]
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "batch_id": "0b8e1c3a-5d2f-4f57-9a53-0d9f4c1e7a21",
+                "status": "PROCESSING",
+                "total": 2,
+                "succeeded": 1,
+                "failed": 0,
+                "jobs": [
+                    {
+                        "job_id": "4fdf9052-261d-4ff0-9521-6de863e785c4",
+                        "status": "SUCCESS",
+                        "output_url": "https://api.geoflip.io/result/output/4fdf9052-261d-4ff0-9521-6de863e785c4"
+                    },
+                    {
+                        "job_id": "9a1d3c55-7e0b-4b7e-8f0a-2c6b1f0e9d34",
+                        "status": "PENDING"
+                    }
+                ]
+            }
+        }
+    )
+
 router = APIRouter()
 logger = logging.getLogger("api")
 
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+def _gunzip_chunks(path: str):
+    with gzip.open(path, "rb") as f:
+        while chunk := f.read(STREAM_CHUNK_SIZE):
+            yield chunk
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Whether an Accept-Encoding header allows gzip, honouring q-values
+    (`gzip;q=0` is a refusal) and the `*` wildcard.
+    """
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding] = q
+
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+def _stored_data_response(request: Request, path: str, encoding: Optional[str]):
+    """
+    Stream an inline result that was stored on disk, as if it came from the result backend.
+    """
+    if encoding == "gzip":
+        # the body depends on Accept-Encoding, so caches must key on it
+        headers = {"Vary": "Accept-Encoding"}
+        # clients that accept gzip get the stored bytes as they are
+        if _accepts_gzip(request.headers.get("accept-encoding", "")):
+            return FileResponse(path=path, media_type="application/json", headers={**headers, "Content-Encoding": "gzip"})
+        return StreamingResponse(_gunzip_chunks(path), media_type="application/json", headers=headers)
+    return FileResponse(path=path, media_type="application/json")
+
 
 @router.get("/result/status/{job_id}",
     response_model=TaskStatusOut,
@@ -64,17 +143,71 @@ async def get_task_status(job_id: str):
         message = "none"
 
     output_url = None
+    plan = None
 
     if result.successful():
         output_url = f"{config.BACKEND_URL}/result/output/{job_id}"
+        plan = result.result.get("plan")
 
     return {
         "job_id": job_id,
         "status": status,
         "message": message,
         "output_url": output_url,
+        "plan": plan,
     }
 
+def _batch_status_out(batch_id: str, results: list) -> BatchStatusOut:
+    """
+    Summarize the results of a batch's jobs. Revoked (expired) jobs will never
+    run, so they count as failed like in job dedupe.
+    """
+    jobs = []
+    succeeded = failed = 0
+    for result in results:
+        status = result.status
+        output_url = None
+        if status == TaskStatus.SUCCESS:
+            succeeded += 1
+            output_url = f"{config.BACKEND_URL}/result/output/{result.id}"
+        elif status in (TaskStatus.FAILURE, TaskStatus.REVOKED):
+            failed += 1
+        jobs.append({"job_id": result.id, "status": status, "output_url": output_url})
+
+    # the batch succeeds once every job has, and fails once every job is done but any failed
+    total = len(jobs)
+    if succeeded + failed == total:
+        batch_status = TaskStatus.FAILURE if failed else TaskStatus.SUCCESS
+    elif all(job["status"] == TaskStatus.PENDING for job in jobs):
+        batch_status = TaskStatus.PENDING
+    else:
+        batch_status = TaskStatus.PROCESSING
+
+    return BatchStatusOut(
+        batch_id=batch_id,
+        status=batch_status,
+        total=total,
+        succeeded=succeeded,
+        failed=failed,
+        jobs=jobs
+    )
+
+@router.get("/result/batch/{batch_id}",
+    response_model=BatchStatusOut,
+    tags=["Results"],
+    responses={
+        404: {"description": "Batch not found", "content": {"application/json": {
+            "example": {"detail": "Batch not found"}
+        }}}
+    }
+)
+async def get_batch_status(batch_id: str):
+    group_result = GroupResult.restore(batch_id, app=celery_app)
+    if group_result is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    return _batch_status_out(batch_id, group_result.results)
+
 @router.get(
     "/result/output/{job_id}",
     tags=["Results"],
@@ -184,7 +317,7 @@ async def get_output(
                 media_type="application/octet-stream"  # Generic, you can be more specific if you know the format
             )
         case "data":
-            payload_size_bytes = len(json.dumps(result.result["output_data"]).encode("utf-8"))
+            payload_size_bytes = result.result.get("output_size_bytes")
 
             await log_usage(
                 tenant_id=current_user.tenant_id,
@@ -198,7 +331,13 @@ async def get_output(
                 processing_time_seconds=processing_time_seconds
             )
 
-            return result.result["output_data"]
+            output_data_path = result.result.get("output_data_path")
+            if output_data_path is not None:
+                if not os.path.exists(output_data_path):
+                    raise HTTPException(status_code=404, detail="Output file not found.")
+                return _stored_data_response(request, output_data_path, result.result.get("output_data_encoding"))
+
+            return Response(content=result.result["output_data"], media_type="application/json")
         case _:
             raise HTTPException(status_code=400, detail=f"Invalid output type: {output_type}")
 
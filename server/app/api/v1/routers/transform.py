@@ -1,21 +1,25 @@
+import os
 import logging
 import json
-import io
 import uuid
 import datetime
-from typing import Annotated, Literal
-from app.api.v1.utils.file_handling import save_input
+from typing import Annotated, List, Literal
+from app.api.v1.utils.file_handling import SavedInput, save_input, discard_input
+from app.api.v1.utils.job_dedupe import job_dedupe_key, claim_job, release_job
 from app.core.security import get_current_user
 from app.accounts.models.user import User
 
 from fastapi import APIRouter, UploadFile, Form, HTTPException, Depends, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import ValidationError, BaseModel, UUID4, ConfigDict
+from celery import group
 
 from app.api.v1.models.transform import TransformIn
 
 from app.api.v1.operations.transform import transform_operation
-from app.api.v1.operations.cleanup import cleanup_operation
+from app.api.v1.operations.sync_transform import try_run_sync
+from app.api.v1.operations.cleanup import cleanup_operation, cleanup_batch_operation
 
 from app.core.config import config as app_config
 from app.core.usage_logger import log_usage
@@ -41,6 +45,76 @@ class TransformQueuedOut(BaseModel):
         }
     )
 
+class TransformBatchQueuedOut(BaseModel):
+    batch_id: UUID4
+    job_ids: List[UUID4]
+    status: Literal["queued"]
+    message: str
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "batch_id": "0b8e1c3a-5d2f-4f57-9a53-0d9f4c1e7a21",
+                "job_ids": ["4fdf9052-261d-4ff0-9521-6de863e785c4"],
+                "status": "queued",
+                "message": "Batch of 1 transformation jobs has been accepted"
+            }
+        }
+    )
+
+def _job_kwargs(job_id: str, transform: TransformIn, saved_input: SavedInput) -> dict:
+    """
+    Arguments of one job, shared by the Celery task (transform_operation) and
+    the synchronous path (run_transform).
+    """
+    return {
+        "job_id": job_id,
+        "input_format": transform.input.format,
+        # convert transformations to a list of dictionaries to pass to the celery task
+        "transformations": [t.model_dump(mode="json") for t in transform.transformations],
+        "output_format": transform.output.format,
+        "output_epsg": transform.output.epsg,
+        "input_epsg": transform.input.epsg,
+        "input_file_path": saved_input.path,
+        "to_file": transform.output.to_file,
+        # read-time projection and filters pushed down into the readers
+        "input_options": transform.input.model_dump(include={"columns", "bbox", "where"}, exclude_none=True),
+        # writer options, e.g. CSV geometry encoding and compression
+        "output_options": transform.output.model_dump(include={"csv_geometry", "compression"}, exclude_none=True),
+        # computed while saving the upload, reused as the stage cache key
+        "input_digest": saved_input.sha256
+    }
+
+def _sync_response(result_msg: dict):
+    if result_msg["output_type"] == "filepath":
+        output_filepath = result_msg["output_filepath"]
+        return FileResponse(
+            path=output_filepath,
+            filename=os.path.basename(output_filepath),
+            media_type="application/octet-stream"
+        )
+    return Response(content=result_msg["output_data"], media_type="application/json")
+
+async def _attached_response(request: Request, current_user: User, job_id: str, payload_size_bytes: int, start_time: datetime.datetime) -> JSONResponse:
+    elapsed = (datetime.datetime.now() - start_time).total_seconds()
+    await log_usage(
+        tenant_id=current_user.tenant_id,
+        user_id=current_user.id,
+        job_id=job_id,
+        endpoint="/transform",
+        success=True,
+        client_ip=request.client.host if request.client else None,
+        payload_size_bytes=payload_size_bytes,
+        response_time_seconds=elapsed,
+        processing_time_seconds=None
+    )
+
+    return JSONResponse({
+        "job_id": job_id,
+        "status": "queued",
+        "message": "Identical transformation job already submitted"
+    })
+
 @router.post("/transform", 
         status_code=200,
         response_model=TransformQueuedOut,
@@ -73,43 +147,80 @@ async def create_transformation(
         raise HTTPException(status_code=400, detail=f"Bad request {e}")
 
     input_format:str = transform.input.format
-    input_epsg: int = transform.input.epsg
     job_id:str = str(uuid.uuid4())
-    input_file_path:str = None
-    output_format:str = transform.output.format
-    output_epsg:int = transform.output.epsg
-    output_to_file: bool = transform.output.to_file
     payload_size_bytes = 0
-    # convert transformations to a list of dictionaries to pass to the celery task
-    transformations: list = [t.model_dump(mode="json") for t in transform.transformations]
 
     if input_format not in SUPPORTED_INPUT_FORMATS:
         raise HTTPException(status_code=400, detail=f"Unsupported input type: {input_format}")
 
-    if input_file:
-        input_file_path = await save_input(input_file, job_id)
-        input_file.file.seek(0, io.SEEK_END)
-        payload_size_bytes = input_file.file.tell()
-        input_file.file.seek(0)
-    else:
+    if not input_file:
         raise HTTPException(status_code=400, detail="input_file is required")
-        
-    # Step 6: Que the celery task
-    logger.info(f"job_id: ({current_user.email}){job_id} - Queuing transformation task for input type: {input_format}")
-    transform_operation.apply_async(
-        args=[
-            job_id, 
-            input_format,
-            transformations,
-            output_format,
-            output_epsg,
-            input_epsg,
-            input_file_path, 
-            output_to_file
-        ],
-        expires=app_config.JOB_EXPIRY_TIME,
-        task_id=job_id
-    )
+
+    saved_input = await save_input(input_file, job_id)
+    payload_size_bytes = saved_input.size_bytes
+    job_kwargs = _job_kwargs(job_id, transform, saved_input)
+
+    # Small jobs that ask for it run right here and return their output directly
+    if transform.sync and payload_size_bytes <= app_config.SYNC_MAX_INPUT_BYTES:
+        try:
+            result_msg = await try_run_sync(**job_kwargs)
+        except ValueError as e:
+            await discard_input(job_id)
+            logger.warning(f"job_id: ({current_user.email}){job_id} - Synchronous transformation failed: {e}")
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            # nothing was queued, so no cleanup task will remove the job directory
+            await discard_input(job_id)
+            logger.error(f"job_id: ({current_user.email}){job_id} - Synchronous transformation failed: {e}", exc_info=True)
+            raise
+
+        if result_msg is not None:
+            logger.info(f"job_id: ({current_user.email}){job_id} - Transformed synchronously")
+            if result_msg["output_type"] == "data":
+                await discard_input(job_id)
+            else:
+                # the output file is streamed back now and removed with the job later
+                cleanup_operation.apply_async(args=[job_id], countdown=app_config.JOB_EXPIRY_TIME, ignore_result=True)
+
+            elapsed = (datetime.datetime.now() - start_time).total_seconds()
+            await log_usage(
+                tenant_id=current_user.tenant_id,
+                user_id=current_user.id,
+                job_id=job_id,
+                endpoint="/transform",
+                success=True,
+                client_ip=request.client.host if request.client else None,
+                payload_size_bytes=payload_size_bytes,
+                response_time_seconds=elapsed,
+                processing_time_seconds=result_msg["processing_time_seconds"]
+            )
+            return _sync_response(result_msg)
+
+        logger.info(f"job_id: ({current_user.email}){job_id} - Synchronous pool busy, queuing instead")
+
+    # Attach identical submissions (same tenant, file and config) to the existing job
+    dedupe_key = None
+    if app_config.JOB_DEDUPE_ENABLED:
+        dedupe_key = job_dedupe_key(current_user.tenant_id, saved_input.sha256, transform)
+        existing_job_id = await run_in_threadpool(claim_job, dedupe_key, job_id)
+        if existing_job_id is not None:
+            logger.info(f"job_id: ({current_user.email}){existing_job_id} - Duplicate submission attached to existing job")
+            await discard_input(job_id)
+            return await _attached_response(request, current_user, existing_job_id, payload_size_bytes, start_time)
+
+    try:
+        # Step 6: Que the celery task
+        logger.info(f"job_id: ({current_user.email}){job_id} - Queuing transformation task for input type: {input_format}")
+        transform_operation.apply_async(
+            kwargs=job_kwargs,
+            expires=app_config.JOB_EXPIRY_TIME,
+            task_id=job_id
+        )
+    except Exception:
+        # let the next identical submission queue its own job
+        if dedupe_key is not None:
+            release_job(dedupe_key, job_id)
+        raise
     logger.info(f"Dispatched celery transform task with job_id: {job_id}")
 
     # Also schedule a cleanup task to clean up expired job data:
@@ -140,4 +251,103 @@ async def create_transformation(
         "job_id": job_id,
         "status": "queued",
         "message": "Transformation job has been accepted"
-    })
\ No newline at end of file
+    })
+
+@router.post("/transform/batch",
+        status_code=200,
+        response_model=TransformBatchQueuedOut,
+        tags=["Transformation"],
+        responses={
+            400: {
+                "description": "Bad Request",
+                "content": {
+                    "application/json": {"example": {"detail": "input is invalid"}}
+                },
+            }
+        }
+    )
+async def create_batch_transformation(
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_user)],
+    config: Annotated[str, Form(...)],
+    input_files: List[UploadFile]
+):
+    """
+    Queue many input files in one request. `config` is either one transform
+    config shared by every file or a list with one config per file, in the
+    order of `input_files`. The jobs run as a Celery group whose id is the
+    batch id; see /result/batch/{batch_id}.
+    """
+    start_time = datetime.datetime.now()
+
+    if not input_files:
+        raise HTTPException(status_code=400, detail="input_files is required")
+    if len(input_files) > app_config.BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"A batch accepts at most {app_config.BATCH_MAX_FILES} input files")
+
+    # Parse and validate the shared or per-file configs
+    try:
+        raw_config = json.loads(config)
+        raw_configs = raw_config if isinstance(raw_config, list) else [raw_config] * len(input_files)
+        transforms = [TransformIn.model_validate(c) for c in raw_configs]
+    except HTTPException:
+        raise
+    except ValidationError as e:
+        logger.warning(f"Validation failed for batch config: {e}")
+        raise HTTPException(status_code=400, detail="input is invalid")
+    except Exception as e:
+        logger.warning(f"Bad request: {e}")
+        raise HTTPException(status_code=400, detail=f"Bad request {e}")
+
+    if len(transforms) != len(input_files):
+        raise HTTPException(status_code=400, detail="config must be one object or a list with one entry per input file")
+
+    batch_id: str = str(uuid.uuid4())
+    job_ids: List[str] = [str(uuid.uuid4()) for _ in input_files]
+    payload_size_bytes = 0
+
+    signatures = []
+    try:
+        for job_id, input_file, transform in zip(job_ids, input_files, transforms):
+            saved_input = await save_input(input_file, job_id)
+            payload_size_bytes += saved_input.size_bytes
+            signatures.append(transform_operation.signature(
+                kwargs=_job_kwargs(job_id, transform, saved_input),
+                expires=app_config.JOB_EXPIRY_TIME,
+                task_id=job_id
+            ))
+    except Exception:
+        # nothing is queued yet, so no cleanup task would remove the inputs saved so far
+        for job_id in job_ids:
+            await discard_input(job_id)
+        raise
+
+    # One group for the transforms and one cleanup task for the whole batch
+    logger.info(f"batch_id: ({current_user.email}){batch_id} - Queuing {len(job_ids)} transformation tasks")
+    group(signatures).apply_async(task_id=batch_id).save()
+    cleanup_batch_operation.apply_async(
+        args=[job_ids],
+        countdown=app_config.JOB_EXPIRY_TIME,
+        ignore_result=True
+    )
+    logger.info(f"Queued transformation batch: {batch_id}")
+
+    elapsed = (datetime.datetime.now() - start_time).total_seconds()
+    await log_usage(
+        tenant_id=current_user.tenant_id,
+        user_id=current_user.id,
+        job_id=batch_id,
+        endpoint="/transform/batch",
+        success=True,
+        client_ip=request.client.host if request.client else None,
+        payload_size_bytes=payload_size_bytes,
+        response_time_seconds=elapsed,
+        processing_time_seconds=None
+    )
+
+    return JSONResponse({
+        "batch_id": batch_id,
+        "job_ids": job_ids,
+        "status": "queued",
+        "message": f"Batch of {len(job_ids)} transformation jobs has been accepted"
+    })
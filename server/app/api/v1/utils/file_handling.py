@@ -1,45 +1,59 @@
 import os
-import time
+import shutil
+import hashlib
 import logging
+from typing import BinaryIO, NamedTuple
 from app.core.config import config as app_config
 from werkzeug.utils import secure_filename
 from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
 
 logger = logging.getLogger("api")
 
-def wait_for_file(file_path:str, timeout:int=10, check_interval:float=0.5):
-    """
-    Waits for a file to be accessible within a given timeout period.
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+class SavedInput(NamedTuple):
+    path: str
+    size_bytes: int
+    sha256: str
+
+def _write_chunk(f: BinaryIO, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    f.write(chunk)
 
-    :param file_path: Path to the file.
-    :param timeout: Maximum time to wait for the file (in seconds).
-    :param check_interval: Time interval between checks (in seconds).
-    :raises FileNotFoundError: If the file is not accessible within the timeout period.
+async def save_input(input_file: UploadFile, job_id: str) -> SavedInput:
+    """
+    Copy an upload into the job's input directory in UPLOAD_CHUNK_SIZE chunks,
+    hashing it on the way. File I/O runs on the threadpool so the event loop
+    keeps serving other requests, and memory use does not grow with the upload.
     """
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-            return True
-        time.sleep(check_interval)
-    raise FileNotFoundError(f"File not accessible: {file_path}")
-
-async def save_input(input_file: UploadFile, job_id: str) -> str:
     job_dir = os.path.join(app_config.DATA_PATH, job_id)
-    os.makedirs(job_dir, exist_ok=True)
-
     input_dir = os.path.join(job_dir, "input")
-    os.makedirs(input_dir, exist_ok=True)
+    await run_in_threadpool(os.makedirs, input_dir, exist_ok=True)
 
     filename = secure_filename(input_file.filename)
     filePath = os.path.join(input_dir, filename)
-    with open(filePath, "wb") as f:
-        f.write(await input_file.read())
 
-    # Check if the file is accessible
+    digest = hashlib.sha256()
+    size_bytes = 0
+    f = await run_in_threadpool(open, filePath, "wb")
     try:
-        wait_for_file(filePath)
-    except FileNotFoundError as e:
-        logger.error(f"File save failed or file not accessible: {e}")
-        raise HTTPException(status_code=400, description="File save failed or not accessible.")
+        while chunk := await input_file.read(UPLOAD_CHUNK_SIZE):
+            await run_in_threadpool(_write_chunk, f, digest, chunk)
+            size_bytes += len(chunk)
+    finally:
+        await run_in_threadpool(f.close)
 
-    return filePath
\ No newline at end of file
+    if size_bytes == 0:
+        logger.error(f"Empty upload for job {job_id}")
+        await discard_input(job_id)
+        raise HTTPException(status_code=400, detail="input_file is empty")
+
+    return SavedInput(filePath, size_bytes, digest.hexdigest())
+
+async def discard_input(job_id: str) -> None:
+    """
+    Remove the job directory of a job that will not be queued.
+    """
+    job_dir = os.path.join(app_config.DATA_PATH, job_id)
+    await run_in_threadpool(shutil.rmtree, job_dir, ignore_errors=True)
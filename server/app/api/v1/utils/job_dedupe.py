@@ -0,0 +1,83 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Optional
+from celery.result import AsyncResult
+
+from app.api.v1.models.transform import TransformIn
+from app.core.celery_worker import celery_app
+from app.core.config import config as app_config
+from app.core.database import redis_client
+
+logger = logging.getLogger("api")
+
+def job_dedupe_key(tenant_id: int, upload_digest: str, transform: TransformIn) -> str:
+    """
+    Redis key identifying a submission: the tenant, the uploaded content and
+    the normalized (validated, defaults filled in) transformation config.
+    """
+    canonical = json.dumps(transform.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(f"{tenant_id}:{upload_digest}:{canonical}".encode("utf-8")).hexdigest()
+    return f"geoflip:job:{digest}"
+
+# replace the claim only if it still belongs to the job we found to be dead
+_TAKE_OVER = redis_client.register_script("""
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    redis.call("SET", KEYS[1], ARGV[2], "EX", ARGV[3])
+    return 1
+end
+return 0
+""")
+
+CLAIM_ATTEMPTS = 3
+
+def _is_reusable(job_id: str, claim_age: int) -> bool:
+    """
+    A job can be attached to while it is queued or running, or once it has
+    succeeded as long as its output has not been cleaned up. Failed and
+    revoked (e.g. expired) jobs are dead, and so is a job still unfinished
+    JOB_DEDUPE_MAX_RUNNING_TIME after it was claimed, since its worker most
+    likely died without recording a result.
+    """
+    status = AsyncResult(job_id, app=celery_app).status
+    if status in ("FAILURE", "REVOKED"):
+        return False
+    if status == "SUCCESS":
+        return os.path.isdir(os.path.join(app_config.DATA_PATH, job_id))
+    return claim_age <= app_config.JOB_DEDUPE_MAX_RUNNING_TIME
+
+def claim_job(key: str, job_id: str) -> Optional[str]:
+    """
+    Register `job_id` as the job for `key`. Returns the id of a live or
+    completed job already registered for the same key, in which case the
+    caller should attach to it instead, or None when `job_id` now owns the key.
+
+    A dead job's claim is taken over with a compare-and-set, so concurrent
+    retries of the same submission end up attached to a single new job.
+    """
+    for _ in range(CLAIM_ATTEMPTS):
+        if redis_client.set(key, job_id, nx=True, ex=app_config.JOB_EXPIRY_TIME):
+            return None
+
+        existing_job_id, ttl = redis_client.pipeline().get(key).ttl(key).execute()
+        if existing_job_id is None:
+            # the key just expired: try to claim it again
+            continue
+        if _is_reusable(existing_job_id, app_config.JOB_EXPIRY_TIME - ttl):
+            return existing_job_id
+
+        # the previous job failed, was revoked or cleaned up: take over
+        if _TAKE_OVER(keys=[key], args=[existing_job_id, job_id, app_config.JOB_EXPIRY_TIME]):
+            return None
+        # another submission took over first: attach to its job on the next pass
+
+    logger.warning(f"Could not settle the dedupe claim {key}, queuing job {job_id} without it")
+    return None
+
+def release_job(key: str, job_id: str) -> None:
+    """
+    Drop the claim of `job_id` on `key`, e.g. when the job could not be queued.
+    """
+    if redis_client.get(key) == job_id:
+        redis_client.delete(key)
@@ -1,5 +1,6 @@
 # celery_worker.py
 from celery import Celery
+from celery.signals import worker_process_init
 from app.core.database import redis_url
 
 # List all modules containing tasks here
@@ -22,4 +23,10 @@ celery_app.conf.update(
     result_serializer="json",
     accept_content=["json"],
     result_expires=3600,  # expire task results after 1 hour
-)
\ No newline at end of file
+)
+
+@worker_process_init.connect
+def warm_worker_caches(**kwargs):
+    # imported here so the API process does not build the CRS cache on import
+    from app.api.v1.operations.geoprocessing.crs import warm_crs_cache
+    warm_crs_cache()
@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import Optional
+from typing import Literal, Optional, List
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -32,6 +32,49 @@ class GlobalConfig(BaseConfig):
     REDIS_SSL: bool = False
 
     JOB_EXPIRY_TIME: int = 3600
+    # attach identical submissions (tenant, upload and config) to the job already running
+    JOB_DEDUPE_ENABLED: bool = True
+    # a job still unfinished this long after it was claimed is presumed lost (e.g. its worker crashed)
+    JOB_DEDUPE_MAX_RUNNING_TIME: int = 900
+    # `sync` jobs up to SYNC_MAX_INPUT_BYTES run inside the API on SYNC_WORKERS threads
+    SYNC_WORKERS: int = 2
+    SYNC_MAX_INPUT_BYTES: int = 1_000_000
+    # most input files accepted by one POST /transform/batch
+    BATCH_MAX_FILES: int = 500
+    # to_file=false results above this size are kept on disk (gzipped) instead of in Redis
+    INLINE_RESULT_MAX_BYTES: int = 1_000_000
+    INLINE_RESULT_COMPRESS: bool = True
+
+    # shapefile parts are written to SHP_SCRATCH_DIR (system temp dir if unset) and streamed into the zip
+    SHP_SCRATCH_DIR: Optional[str] = None
+    SHP_ZIP_COMPRESSION: Literal["deflated", "stored"] = "deflated"
+    SHP_ZIP_COMPRESSLEVEL: int = 6
+
+    # rows converted and written per chunk by the CSV writer
+    CSV_CHUNK_SIZE: int = 100_000
+
+    # read vector inputs as Arrow batches through pyogrio instead of the default path
+    READER_USE_ARROW: bool = False
+
+    # threads used to buffer large inputs, and geometries handed to each thread at a time
+    BUFFER_WORKERS: int = 1
+    BUFFER_CHUNK_SIZE: int = 50_000
+
+    # inputs above UNION_PARTITION_SIZE are unioned tile by tile on UNION_WORKERS threads
+    UNION_WORKERS: int = 1
+    UNION_PARTITION_SIZE: int = 50_000
+    # check union inputs for a valid polygon coverage when the request gives no hint
+    UNION_DETECT_COVERAGE: bool = False
+    # buffer followed by union is dissolved in spatially sorted batches of this size
+    BUFFER_UNION_BATCH_SIZE: int = 2_000
+
+    # GeoParquet cache of parsed inputs and transformation stages under DATA_PATH/stage_cache
+    STAGE_CACHE_ENABLED: bool = False
+    STAGE_CACHE_MAX_BYTES: int = 2 * 1024 ** 3
+
+    # per-process LRU cache of pyproj CRS/Transformer objects, warmed on worker start
+    CRS_CACHE_SIZE: int = 256
+    CRS_CACHE_WARM_EPSG: List[int] = [4326, 3857]
 
     model_config = SettingsConfigDict(env_prefix="")
 
@@ -52,8 +52,8 @@ app = FastAPI(
     description="""
 Geoflip is a **FastAPI-based geospatial transformation engine** that makes working with spatial data **simple, scalable, and automation-friendly**.
 
-- 📥 **Input formats**: GeoJSON, Shapefile (SHP), DXF  
-- 📤 **Output formats**: GeoJSON (file or inline), Shapefile (zipped), DXF (R2018)  
+- 📥 **Input formats**: GeoJSON, Shapefile (SHP), DXF, CSV (WKT), FlatGeobuf, GeoParquet, Feather (Arrow IPC)  
+- 📤 **Output formats**: GeoJSON (file or inline), Shapefile (zipped), DXF (R2018), CSV (WKT), FlatGeobuf, GeoParquet, Feather (Arrow IPC)  
 - 🔧 **Transformations**: buffer, union (with more coming soon)  
 - 🌐 **Reprojection**: automatic reprojection into any EPSG code via `output.epsg`  
 - ⏳ **Asynchronous jobs**: submit, poll status, download results  
@@ -0,0 +1,68 @@
+import pytest
+import json
+import time
+import asyncio
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+from httpx import AsyncClient
+from app.tests.utils import run_output_test
+from app.api.v1.routers.result import TaskStatus, _batch_status_out
+
+@pytest.mark.anyio
+async def test_transform_batch(async_client: AsyncClient):
+    data_dir = Path(__file__).parent / "data"
+    config = [
+        {
+            "input": {"format": "shp"},
+            "transformations": [{"type": "buffer", "params": {"distance": 500, "units": "meters"}}],
+            "output": {"format": "geojson", "epsg": 4326}
+        },
+        {
+            "input": {"format": "dxf", "epsg": 4326},
+            "output": {"format": "fgb", "epsg": 4326}
+        }
+    ]
+
+    with open(data_dir / "test_shp.zip", "rb") as shp, open(data_dir / "test.dxf", "rb") as dxf:
+        response = await async_client.post(
+            "/transform/batch",
+            files=[
+                ("config", (None, json.dumps(config), "application/json")),
+                ("input_files", ("test_shp.zip", shp, "application/zip")),
+                ("input_files", ("test.dxf", dxf, "application/octet-stream"))
+            ]
+        )
+
+    assert response.status_code == 200
+    batch_id = response.json()["batch_id"]
+    job_ids = response.json()["job_ids"]
+    assert len(job_ids) == 2
+
+    deadline = time.monotonic() + 30.0
+    while True:
+        status = await async_client.get(f"/result/batch/{batch_id}")
+        assert status.status_code == 200
+        state = status.json()["status"]
+        if state == "SUCCESS":
+            break
+        assert state != "FAILURE", status.json()
+        assert time.monotonic() < deadline, f"Batch {batch_id} did not finish"
+        await asyncio.sleep(0.1)
+
+    for job_id in job_ids:
+        assert await run_output_test(job_id, async_client) == "success"
+
+def test_batch_status_counts_revoked_jobs_as_failed():
+    # jobs that expire before a worker picks them up are REVOKED by Celery
+    results = [
+        SimpleNamespace(id=str(uuid.uuid4()), status="SUCCESS"),
+        SimpleNamespace(id=str(uuid.uuid4()), status="REVOKED"),
+    ]
+
+    summary = _batch_status_out(str(uuid.uuid4()), results)
+
+    assert summary.jobs[1].status == TaskStatus.REVOKED
+    assert summary.succeeded == 1
+    assert summary.failed == 1
+    assert summary.status == TaskStatus.FAILURE
@@ -0,0 +1,36 @@
+import pytest
+import json
+from pathlib import Path
+from httpx import AsyncClient
+from app.tests.utils import run_output_test
+
+@pytest.mark.anyio
+async def test_transform_duplicate_submission(async_client: AsyncClient):
+    config = {
+        "input": {"format": "shp"},
+        "transformations": [
+            {"type": "buffer", "params": {"distance": 250, "units": "meters"}}
+        ],
+        "output": {"format": "geojson", "epsg": 4326}
+    }
+
+    shp_path = Path(__file__).parent / "data" / "test_shp.zip"
+    job_ids = []
+    for _ in range(2):
+        with open(shp_path, "rb") as f:
+            response = await async_client.post(
+                "/transform",
+                files={
+                    "config": (None, json.dumps(config), "application/json"),
+                    "input_file": ("test_shp.zip", f, "application/zip")
+                }
+            )
+        assert response.status_code == 200
+        job_ids.append(response.json()["job_id"])
+
+    # the identical second submission is attached to the first job
+    assert job_ids[0] == job_ids[1]
+    assert response.json()["message"] == "Identical transformation job already submitted"
+
+    result = await run_output_test(job_ids[0], async_client)
+    assert result == "success"
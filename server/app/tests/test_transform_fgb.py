@@ -0,0 +1,47 @@
+import pytest
+import json
+from pathlib import Path
+import geopandas as gpd
+from httpx import AsyncClient
+from app.tests.utils import run_output_test
+
+@pytest.fixture()
+def fgb_path(tmp_path: Path) -> Path:
+    gdf = gpd.read_file(Path(__file__).parent / "data" / "test_shp.zip")
+    path = tmp_path / "test.fgb"
+    gdf.to_file(path, driver="FlatGeobuf")
+    return path
+
+@pytest.mark.anyio
+async def test_transform_fgb_bbox(async_client: AsyncClient, fgb_path: Path, tmp_path: Path):
+    input_gdf = gpd.read_file(fgb_path)
+    minx, miny, maxx, maxy = input_gdf.total_bounds
+    config = {
+        "input": {"format": "fgb", "bbox": [minx, miny, (minx + maxx) / 2, maxy]},
+        "transformations": [
+            {"type": "buffer", "params": {"distance": 500, "units": "meters"}}
+        ],
+        "output": {"format": "fgb", "epsg": 4326}
+    }
+
+    with open(fgb_path, "rb") as f:
+        response = await async_client.post(
+            "/transform",
+            files={
+                "config": (None, json.dumps(config), "application/json"),
+                "input_file": ("test.fgb", f, "application/octet-stream")
+            }
+        )
+
+    assert response.status_code == 200
+    job_id = response.json()["job_id"]
+
+    result = await run_output_test(job_id, async_client)
+    assert result == "success"
+
+    # the bbox covers the western half of the data, so some features are filtered out on read
+    output_response = await async_client.get(f"/result/output/{job_id}")
+    output_path = tmp_path / "output.fgb"
+    output_path.write_bytes(output_response.content)
+    output_gdf = gpd.read_file(output_path)
+    assert 0 < len(output_gdf) < len(input_gdf)
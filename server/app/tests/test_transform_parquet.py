@@ -0,0 +1,65 @@
+import pytest
+import json
+from pathlib import Path
+import geopandas as gpd
+from httpx import AsyncClient
+from app.tests.utils import run_output_test
+
+@pytest.fixture()
+def parquet_path(tmp_path: Path) -> Path:
+    gdf = gpd.read_file(Path(__file__).parent / "data" / "test_shp.zip")
+    path = tmp_path / "test.parquet"
+    gdf.to_parquet(path)
+    return path
+
+@pytest.mark.anyio
+async def test_transform_parquet_to_feather(async_client: AsyncClient, parquet_path: Path):
+    config = {
+        "input": {"format": "parquet"},
+        "transformations": [
+            {"type": "buffer", "params": {"distance": 500, "units": "meters"}},
+            {"type": "union"}
+        ],
+        "output": {"format": "feather", "epsg": 4326}
+    }
+
+    with open(parquet_path, "rb") as f:
+        response = await async_client.post(
+            "/transform",
+            files={
+                "config": (None, json.dumps(config), "application/json"),
+                "input_file": ("test.parquet", f, "application/octet-stream")
+            }
+        )
+
+    assert response.status_code == 200
+    job_id = response.json()["job_id"]
+
+    result = await run_output_test(job_id, async_client)
+    assert result == "success"
+
+@pytest.mark.anyio
+async def test_transform_shp_to_parquet(async_client: AsyncClient):
+    config = {
+        "input": {"format": "shp"},
+        "transformations": [
+            {"type": "buffer", "params": {"distance": 500, "units": "meters"}}
+        ],
+        "output": {"format": "parquet", "epsg": 4326}
+    }
+
+    shp_path = Path(__file__).parent / "data" / "test_shp.zip"
+    with open(shp_path, "rb") as f:
+        response = await async_client.post(
+            "/transform",
+            files={
+                "config": (None, json.dumps(config), "application/json"),
+                "input_file": ("test_shp.zip", f, "application/zip")
+            }
+        )
+
+    assert response.status_code == 200
+    job_id = response.json()["job_id"]
+
+    result = await run_output_test(job_id, async_client)
+    assert result == "success"
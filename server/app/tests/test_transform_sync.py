@@ -0,0 +1,55 @@
+import pytest
+import json
+from pathlib import Path
+from httpx import AsyncClient
+
+shp_path = Path(__file__).parent / "data" / "test_shp.zip"
+
+@pytest.mark.anyio
+async def test_transform_sync_geojson_data(async_client: AsyncClient):
+    config = {
+        "input": {"format": "shp"},
+        "transformations": [
+            {"type": "buffer", "params": {"distance": 500, "units": "meters"}}
+        ],
+        "output": {"format": "geojson", "to_file": False},
+        "sync": True
+    }
+
+    with open(shp_path, "rb") as f:
+        response = await async_client.post(
+            "/transform",
+            files={
+                "config": (None, json.dumps(config), "application/json"),
+                "input_file": ("test_shp.zip", f, "application/zip")
+            }
+        )
+
+    # the GeoJSON comes back in the response instead of a job id
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    output = response.json()
+    assert "job_id" not in output
+    assert output["type"] == "FeatureCollection"
+    assert len(output["features"]) > 0
+
+@pytest.mark.anyio
+async def test_transform_sync_shp_file(async_client: AsyncClient):
+    config = {
+        "input": {"format": "shp"},
+        "output": {"format": "shp", "epsg": 4326},
+        "sync": True
+    }
+
+    with open(shp_path, "rb") as f:
+        response = await async_client.post(
+            "/transform",
+            files={
+                "config": (None, json.dumps(config), "application/json"),
+                "input_file": ("test_shp.zip", f, "application/zip")
+            }
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert "geoflip_shp_4326.zip" in response.headers["content-disposition"]